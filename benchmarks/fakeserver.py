@@ -0,0 +1,353 @@
+"""
+
+.. module:: django-ewiz.benchmarks.fakeserver
+    :synopsis: A local stand-in for the EnterpriseWizard REST interface.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+Speaks the EWREST_...='...'; response format for EWSelect, EWRead, EWCreate, EWUpdate and EWAttach, serving
+generated tables from memory. Latency, jitter and error rates are configurable so that benchmark runs can emulate
+a remote server. Run it standalone with ``python -m benchmarks.fakeserver --help``.
+
+"""
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from urllib.parse import urlsplit, parse_qsl, unquote
+import argparse
+import gzip
+import hashlib
+import random
+import re
+import sys
+import time
+
+
+STATUSES = ['New', 'Open', 'Pending', 'Resolved', 'Closed']
+
+
+def generate_table(size, description_size=200, seed=0):
+    """Generates ``size`` tickets keyed on their ticket id."""
+
+    rng = random.Random(seed)
+    table = {}
+
+    for ticket_id in range(1, size + 1):
+        table[str(ticket_id)] = {
+            'id': str(ticket_id),
+            'subject': 'Ticket %d' % ticket_id,
+            'status': rng.choice(STATUSES),
+            'priority': str(rng.randint(1, 5)),
+            'submitter_username': 'user%d' % rng.randint(1, 50),
+            'description': ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz ') for i in range(description_size)),
+            'attached_files': '',
+        }
+
+    return table
+
+
+class Where(object):
+    """Evaluates the subset of EWSelect where clauses generated by django_ewiz against in-memory tickets."""
+
+    CLAUSE_PATTERN = re.compile(r"^(?P<where>.*?)(?: ORDER BY (?P<ordering>.*?))?(?: LIMIT (?P<limit>\d+))?(?: OFFSET (?P<offset>\d+))?$", re.DOTALL)
+    FILTER_PATTERN = re.compile(r"^(?P<column>\w+) (?P<operator>NOT IN|IN|NOT LIKE|LIKE|NOT BETWEEN|BETWEEN|IS NOT NULL|IS NULL|!=|>=|<=|=|>|<) ?(?P<value>.*)$", re.DOTALL)
+    VALUE_PATTERN = re.compile(r"'((?:[^']|'')*)'")
+
+    def __init__(self, clause):
+        match = self.CLAUSE_PATTERN.match(clause)
+
+        self.filters = [self.compile_filter(query_filter) for query_filter in self.split(match.group('where')) if query_filter]
+        self.descending = bool(match.group('ordering')) and match.group('ordering').endswith('DESC')
+        self.limit = int(match.group('limit')) if match.group('limit') else None
+        self.offset = int(match.group('offset')) if match.group('offset') else 0
+
+    @staticmethod
+    def split(where):
+        """Splits a where clause on AND, ignoring the AND of BETWEEN and anything quoted."""
+
+        filters = []
+        current = ''
+        quoted = False
+        between = False
+
+        for token in re.split(r"( AND |')", where):
+            if token == "'":
+                quoted = not quoted
+            elif token == ' AND ' and not quoted:
+                if between:
+                    between = False
+                else:
+                    filters.append(current)
+                    current = ''
+                    continue
+            elif not quoted and 'BETWEEN' in token:
+                between = True
+
+            current += token
+
+        filters.append(current)
+        return filters
+
+    @staticmethod
+    def like(pattern):
+        return re.compile('^' + '.*'.join(re.escape(part) for part in pattern.split('%')) + '$', re.DOTALL | re.IGNORECASE)
+
+    def compile_filter(self, query_filter):
+        match = self.FILTER_PATTERN.match(query_filter.strip())
+        column, operator = match.group('column'), match.group('operator')
+        values = [value.replace("''", "'") for value in self.VALUE_PATTERN.findall(match.group('value'))]
+
+        def key(value):
+            return (0, float(value), value) if re.match(r"^-?\d+(\.\d+)?$", value) else (1, 0, value.lower())
+
+        if operator.endswith('LIKE'):
+            pattern = self.like(values[0])
+            test = lambda value: bool(pattern.match(value))
+        elif operator.endswith('IN'):
+            options = set(value.lower() for value in values)
+            test = lambda value: value.lower() in options
+        elif operator.endswith('BETWEEN'):
+            test = lambda value: key(values[0]) <= key(value) <= key(values[1])
+        elif operator.endswith('NULL'):
+            test = lambda value: not value
+        elif operator in ('=', '!='):
+            test = lambda value: value.lower() == values[0].lower()
+        else:
+            comparisons = {
+                '>': lambda a, b: a > b,
+                '>=': lambda a, b: a >= b,
+                '<': lambda a, b: a < b,
+                '<=': lambda a, b: a <= b,
+            }
+            comparison = comparisons[operator]
+            test = lambda value: comparison(key(value), key(values[0]))
+
+        negated = operator.startswith('NOT') or operator == '!=' or operator == 'IS NOT NULL'
+
+        return lambda ticket: test(ticket.get(column, '')) != negated
+
+    def select(self, table):
+        id_list = [ticket_id for ticket_id, ticket in table.items() if all(test(ticket) for test in self.filters)]
+        id_list.sort(key=int, reverse=self.descending)
+
+        end = None if self.limit is None else self.offset + self.limit
+        return id_list[self.offset:end]
+
+
+class FakeEwizServer(ThreadingMixIn, HTTPServer):
+    """
+
+    A threaded HTTP server that serves the EnterpriseWizard REST interface from memory.
+
+    :param tables: A dictionary of table names and their tickets (see generate_table).
+    :param latency: The seconds each response is delayed by.
+    :param jitter: The maximum seconds randomly added to or removed from latency.
+    :param error_rate: The fraction of requests that fail with an HTTP 500.
+    :param compress: Whether responses are gzipped for clients that accept it.
+    :param etags: Whether ticket reads carry an ETag and are answered with a 304 when the client's copy is current.
+    :param accept_post: Whether requests can be sent as form-encoded POSTs; if False, they are refused with an HTTP 405.
+
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), tables=None, latency=0.0, jitter=0.0, error_rate=0.0, compress=True, etags=False, accept_post=True, seed=0):
+        HTTPServer.__init__(self, address, EwizRequestHandler)
+
+        self.tables = tables if tables is not None else {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.compress = compress
+        self.etags = etags
+        self.accept_post = accept_post
+        self.random = random.Random(seed)
+        self.lock = Lock()
+        self.request_count = 0
+
+    @property
+    def base_url(self):
+        """The HOST setting to use for this server (including the trailing slash)."""
+
+        return '%s:%d/ewws/' % self.server_address[:2]
+
+    def start(self):
+        """Serves requests on a daemon thread until stop() is called."""
+
+        self.thread = Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def next_id(self, table):
+        return str(max([int(ticket_id) for ticket_id in table] or [0]) + 1)
+
+
+class EwizRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body are written separately, which Nagle's algorithm would hold back for a delayed ACK (~40ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_PUT(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def handle_request(self):
+        server = self.server
+
+        with server.lock:
+            server.request_count += 1
+            delay = max(server.latency + server.random.uniform(-server.jitter, server.jitter), 0)
+            fail = server.random.random() < server.error_rate
+
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        if delay:
+            time.sleep(delay)
+
+        url = urlsplit(self.path)
+        operation = url.path.rstrip('/').rsplit('/', 1)[-1]
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+
+        if self.command == 'POST' and not server.accept_post:
+            return self.respond(405, 'Method Not Allowed')
+
+        if self.command == 'POST' and body:
+            params.update(parse_qsl(body.decode('utf-8'), keep_blank_values=True))
+
+        if fail:
+            return self.respond(500, 'Internal Server Error')
+
+        handler = getattr(self, 'handle_' + operation, None)
+        table = server.tables.get(params.get('$table'))
+
+        if handler is None or table is None:
+            return self.respond(404, 'Not Found')
+
+        try:
+            lines = handler(table, params, body)
+        except Exception as error:
+            return self.respond(500, 'Error executing query, please consult logs: %s' % error)
+
+        text = '\n'.join(lines)
+
+        if server.etags and operation == 'EWRead':
+            etag = '"%s"' % hashlib.md5(text.encode('utf-8')).hexdigest()
+
+            if self.headers.get('If-None-Match') == etag:
+                return self.respond(304, '', {'ETag': etag})
+
+            return self.respond(200, text, {'ETag': etag})
+
+        self.respond(200, text)
+
+    def respond(self, status, text, headers=None):
+        data = text.encode('utf-8')
+        compress = self.server.compress and 'gzip' in self.headers.get('Accept-Encoding', '') and status != 304
+
+        if compress:
+            data = gzip.compress(data, 6)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def fields(self, params):
+        """Returns the ticket fields of a create/update request, stripping the related field marker."""
+
+        return dict((key, unquote(value).replace('&amp;', '&').lstrip(':')) for key, value in params.items()
+                    if not key.startswith('$') and key not in ('id', 'time_spent'))
+
+    def handle_EWSelect(self, table, params, body):
+        id_list = Where(params['where']).select(table)
+
+        return ["EWREST_id_length = '%d';" % len(id_list)] + ["EWREST_id_%d = '%s';" % (index, ticket_id) for index, ticket_id in enumerate(id_list)]
+
+    def handle_EWRead(self, table, params, body):
+        ticket = table[params['id']]
+
+        return ["EWREST_%s='%s';" % (key, value) for key, value in ticket.items()]
+
+    def handle_EWCreate(self, table, params, body):
+        with self.server.lock:
+            ticket_id = self.server.next_id(table)
+            table[ticket_id] = dict(self.fields(params), id=ticket_id)
+
+        return ["EWREST_id='%s';" % ticket_id]
+
+    def handle_EWUpdate(self, table, params, body):
+        with self.server.lock:
+            table[params['id']].update(self.fields(params))
+
+        return ["EWREST_id='%s';" % params['id']]
+
+    def handle_EWAttach(self, table, params, body):
+        with self.server.lock:
+            ticket = table[params['id']]
+            files = [name for name in ticket.get(params['field'], '').split(',') if name] + [params['fileName']]
+            ticket[params['field']] = ','.join(files)
+
+        return ["EWREST_attachments='%d';" % len(files)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves a fake EnterpriseWizard REST interface.")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--table', default='benchmark_ticket', help="The name of the generated table.")
+    parser.add_argument('--size', type=int, default=1000, help="The number of tickets in the generated table.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to each response.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Maximum seconds randomly added to or removed from the latency.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests that fail with an HTTP 500.")
+    parser.add_argument('--no-compress', dest='compress', action='store_false', help="Never gzip responses.")
+    parser.add_argument('--etags', action='store_true', help="Send ETags with ticket reads and answer conditional reads of unchanged tickets with a 304.")
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+
+    server = FakeEwizServer(('127.0.0.1', arguments.port), tables={arguments.table: generate_table(arguments.size, seed=arguments.seed)},
+                            latency=arguments.latency, jitter=arguments.jitter, error_rate=arguments.error_rate,
+                            compress=arguments.compress, etags=arguments.etags, seed=arguments.seed)
+
+    print("Serving %s (%d tickets) at http://%s" % (arguments.table, arguments.size, server.base_url))
+    sys.stdout.flush()
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
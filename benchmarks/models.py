@@ -0,0 +1,38 @@
+"""
+
+.. module:: django-ewiz.benchmarks.models
+    :synopsis: Models used by the django-ewiz benchmark suite.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.db.models import Model, AutoField, CharField, TextField
+
+
+class BenchmarkTicket(Model):
+    ticket_id = AutoField(primary_key=True, db_column='id')
+    subject = CharField(max_length=255)
+    status = CharField(max_length=20)
+    priority = CharField(max_length=2)
+    submitter_username = CharField(max_length=50, help_text=':')
+    description = TextField(blank=True)
+    attached_files = CharField(max_length=255, help_text='file', editable=False)
+
+    class Meta:
+        app_label = 'benchmarks'
+        db_table = 'benchmark_ticket'
+        managed = False
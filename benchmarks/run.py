@@ -0,0 +1,326 @@
+"""
+
+.. module:: django-ewiz.benchmarks.run
+    :synopsis: django-ewiz benchmark suite.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+Runs common ORM patterns against a local FakeEwizServer (in its own process, so that its work isn't counted)
+and reports latency percentiles, throughput, client CPU time, request counts, response bytes and peak memory for each. Results can be saved as JSON and compared across commits:
+
+    python -m benchmarks.run --output before.json
+    git checkout other-branch
+    python -m benchmarks.run --compare before.json
+
+Compare ``--accept-encoding identity`` with the default on the bulk_iteration scenario to measure the bandwidth and
+CPU cost of response compression.
+
+"""
+
+from collections import defaultdict
+from io import BytesIO
+from threading import Lock
+from time import perf_counter, process_time
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tracemalloc
+
+import django
+from django.conf import settings
+
+
+
+SCENARIOS = {}
+
+
+def scenario(func):
+    SCENARIOS[func.__name__] = func
+    return func
+
+
+class RequestCounter(object):
+    """Counts the requests, response bytes, coalesced requests and ticket cache hits reported through the ewiz_request signal."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = defaultdict(int)
+        self.response_bytes = 0
+        self.wire_bytes = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def __call__(self, sender, operation, response_bytes=0, wire_bytes=0, coalesced=False, cache_hit=False, **kwargs):
+        with self.lock:
+            # Cache hits aren't sent to the server
+            if cache_hit:
+                self.cache_hits += 1
+                return
+
+            self.requests[operation] += 1
+            self.response_bytes += response_bytes
+            self.wire_bytes += wire_bytes
+            self.coalesced += int(coalesced)
+
+
+def start_server(arguments):
+    """Starts a FakeEwizServer subprocess and returns it along with its HOST setting."""
+
+    command = [sys.executable, '-m', 'benchmarks.fakeserver', '--port', '0', '--size', str(arguments.size), '--latency', str(arguments.latency),
+               '--jitter', str(arguments.jitter), '--error-rate', str(arguments.error_rate), '--seed', str(arguments.seed)]
+
+    if not arguments.compress:
+        command.append('--no-compress')
+
+    if arguments.etags:
+        command.append('--etags')
+
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    host = server.stdout.readline().decode().strip().rsplit('http://', 1)[-1]
+
+    return server, host
+
+
+def configure(host, arguments):
+    settings.configure(
+        DEBUG=False,
+        INSTALLED_APPS=['django_ewiz', 'benchmarks'],
+        DATABASES={
+            'default': {
+                'ENGINE': 'django_ewiz',
+                'NAME': 'benchmark',
+                'USER': 'benchmark',
+                'PASSWORD': 'benchmark',
+                'HOST': host,
+                'PORT': '80',
+                'NUM_CONNECTIONS': arguments.num_connections,
+                'ACCEPT_ENCODING': arguments.accept_encoding,
+                'WRITE_TRANSPORT': arguments.write_transport,
+                'TICKET_CACHE_TIMEOUT': arguments.ticket_cache_timeout,
+            },
+        },
+    )
+
+    if hasattr(django, 'setup'):
+        django.setup()
+
+
+@scenario
+def list_page(context, rng):
+    """A 25 ticket list page at a random offset."""
+
+    offset = rng.randrange(max(context['size'] - 25, 1))
+    list(context['model'].objects.all()[offset:offset + 25])
+
+
+@scenario
+def get_by_pk(context, rng):
+    context['model'].objects.get(pk=rng.randint(1, context['size']))
+
+
+@scenario
+def count(context, rng):
+    context['model'].objects.filter(status=rng.choice(['New', 'Open', 'Pending'])).count()
+
+
+@scenario
+def bulk_iteration(context, rng):
+    """Iterates over the whole table."""
+
+    for ticket in context['model'].objects.all():
+        pass
+
+
+@scenario
+def in_lookup(context, rng):
+    """Fetches 500 random tickets by id."""
+
+    id_list = rng.sample(range(1, context['size'] + 1), min(500, context['size']))
+    list(context['model'].objects.filter(pk__in=id_list))
+
+
+@scenario
+def save(context, rng):
+    """Creates a ticket, then updates it."""
+
+    ticket = context['model'](subject='Benchmark', status='New', priority='3', submitter_username='benchmark', description='x' * 2000)
+    ticket.save()
+
+    ticket.status = 'Open'
+    ticket.save()
+
+
+@scenario
+def attach(context, rng):
+    from django_ewiz import EwizAttacher
+
+    ticket = context['model'](pk=rng.randint(1, context['size']))
+    EwizAttacher(settings.DATABASES['default'], ticket, BytesIO(b'x' * 65536), 'benchmark.bin').attach_file()
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(int(round(fraction * (len(samples) - 1))), len(samples) - 1)]
+
+
+def run_scenario(name, context, counter, iterations, warmup, seed):
+    func = SCENARIOS[name]
+    rng = random.Random(seed)
+
+    for i in range(warmup):
+        func(context, rng)
+
+    counter.reset()
+    latencies = []
+    started = perf_counter()
+    cpu_started = process_time()
+
+    for i in range(iterations):
+        operation_started = perf_counter()
+        func(context, rng)
+        latencies.append(perf_counter() - operation_started)
+
+    elapsed = perf_counter() - started
+    cpu = process_time() - cpu_started
+    requests = dict(counter.requests)
+    response_bytes = counter.response_bytes
+    wire_bytes = counter.wire_bytes
+    coalesced = counter.coalesced
+    cache_hits = counter.cache_hits
+
+    # Peak memory is measured on a separate run so that tracing doesn't skew the latencies.
+    tracemalloc.start()
+    func(context, rng)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies) * 1000,
+        'ops_per_second': iterations / elapsed,
+        'cpu_ms_per_op': cpu / iterations * 1000,
+        'requests_per_op': dict((operation, float(total) / iterations) for operation, total in requests.items()),
+        'bytes_per_op': float(response_bytes) / iterations,
+        'wire_bytes_per_op': float(wire_bytes) / iterations,
+        'coalesced_per_op': float(coalesced) / iterations,
+        'cache_hits_per_op': float(cache_hits) / iterations,
+        'peak_memory_kb': peak_memory / 1024.0,
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    columns = ['p50_ms', 'p95_ms', 'p99_ms', 'ops_per_second', 'cpu_ms_per_op', 'wire_bytes_per_op', 'peak_memory_kb']
+
+    print("%-16s" % 'scenario' + ''.join("%18s" % column for column in columns) + "  requests/op")
+
+    for name, result in results['scenarios'].items():
+        row = "%-16s" % name
+        for column in columns:
+            row += "%18.2f" % result.get(column, 0)
+
+        print(row + "  " + ", ".join("%s=%.1f" % item for item in sorted(result['requests_per_op'].items())))
+
+        if baseline and name in baseline['scenarios']:
+            row = "%-16s" % "  vs baseline"
+            for column in columns:
+                before = baseline['scenarios'][name].get(column)
+                row += "%17.1f%%" % ((result[column] - before) / before * 100) if before else "%18s" % '-'
+
+            print(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks django-ewiz against a local fake EnterpriseWizard server.")
+    parser.add_argument('scenarios', nargs='*', help="The scenarios to run: %s (default: all)." % ", ".join(sorted(SCENARIOS)))
+    parser.add_argument('--size', type=int, default=1000, help="The number of tickets in the benchmark table.")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.005, help="Seconds added to each response by the server.")
+    parser.add_argument('--jitter', type=float, default=0.001)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--num-connections', type=int, default=8)
+    parser.add_argument('--accept-encoding', default='gzip, deflate', help="The ACCEPT_ENCODING setting, e.g. 'identity' to disable compression.")
+    parser.add_argument('--write-transport', choices=['get', 'post'], default='get', help="The WRITE_TRANSPORT setting.")
+    parser.add_argument('--no-compress', dest='compress', action='store_false', help="Never gzip responses on the server.")
+    parser.add_argument('--ticket-cache-timeout', type=float, default=None, help="The TICKET_CACHE_TIMEOUT setting (default: no ticket cache).")
+    parser.add_argument('--etags', action='store_true', help="Have the server send ETags and answer conditional reads of unchanged tickets with a 304.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Saves the results as JSON.")
+    parser.add_argument('--compare', help="Compares the results with previously saved JSON results.")
+    arguments = parser.parse_args(argv)
+
+    for name in arguments.scenarios:
+        if name not in SCENARIOS:
+            parser.error("Unknown scenario: %s" % name)
+
+    server, host = start_server(arguments)
+
+    # Stop the server however setup or a scenario fails, so that it isn't left running
+    try:
+        configure(host, arguments)
+
+        from django_ewiz.signals import ewiz_request
+        from .models import BenchmarkTicket
+
+        counter = RequestCounter()
+        ewiz_request.connect(counter, weak=False)
+
+        context = {'model': BenchmarkTicket, 'size': arguments.size}
+        results = {
+            'commit': get_commit(),
+            'python': sys.version.split()[0],
+            'django': django.get_version(),
+            'config': dict((key, value) for key, value in vars(arguments).items() if key not in ('scenarios', 'output', 'compare')),
+            'scenarios': {},
+        }
+
+        for name in arguments.scenarios or sorted(SCENARIOS):
+            results['scenarios'][name] = run_scenario(name, context, counter, arguments.iterations, arguments.warmup, arguments.seed)
+    finally:
+        server.terminate()
+        server.wait()
+        server.stdout.close()
+
+    baseline = None
+    if arguments.compare:
+        with open(arguments.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    print_results(results, baseline)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
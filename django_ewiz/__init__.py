@@ -20,6 +20,9 @@ along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
 """
 
 from .attacher import EwizAttacher
+from .related import EwizManager, EwizQuerySet, Related, prefetch_related_tickets
+
+default_app_config = 'django_ewiz.apps.EwizConfig'
 
 #
 # Version Classification
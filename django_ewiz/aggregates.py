@@ -0,0 +1,151 @@
+"""
+
+.. module:: django-ewiz.aggregates
+    :synopsis: django-ewiz client-side aggregate accumulators.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from decimal import Decimal
+import logging
+
+from django.db.utils import DatabaseError
+
+
+logging.getLogger("django_ewiz")
+
+
+def to_number(value):
+    """Coerces a value read from a ticket into a number, as the database would for SUM and AVG."""
+
+    if isinstance(value, (int, float, Decimal)):
+        return value
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise DatabaseError("Can't aggregate the non-numeric value %r." % value)
+
+
+class Accumulator(object):
+    """
+
+    Folds the values of one column of a stream of tickets into a single aggregate value.
+
+    Like their SQL counterparts, accumulators ignore empty values. If field is None, the accumulator
+    counts tickets (i.e. COUNT(*)).
+
+    """
+
+    def __init__(self, field=None, distinct=False):
+        self.field = field
+        self.column = field.column if field is not None else None
+        self.seen = set() if distinct else None
+
+    def add(self, ticket):
+        if self.column is None:
+            return self.fold(None)
+
+        value = ticket.get(self.column)
+        if value is None or value == '':
+            return
+
+        value = self.field.to_python(value)
+
+        if self.seen is not None:
+            if value in self.seen:
+                return
+
+            self.seen.add(value)
+
+        self.fold(value)
+
+    def fold(self, value):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class Count(Accumulator):
+    def __init__(self, *args, **kwargs):
+        super(Count, self).__init__(*args, **kwargs)
+        self.count = 0
+
+    def fold(self, value):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+
+class Sum(Accumulator):
+    def __init__(self, *args, **kwargs):
+        super(Sum, self).__init__(*args, **kwargs)
+        self.total = None
+
+    def fold(self, value):
+        value = to_number(value)
+        self.total = value if self.total is None else self.total + value
+
+    def result(self):
+        return self.total
+
+
+class Avg(Sum):
+    def __init__(self, *args, **kwargs):
+        super(Avg, self).__init__(*args, **kwargs)
+        self.count = 0
+
+    def fold(self, value):
+        super(Avg, self).fold(value)
+        self.count += 1
+
+    def result(self):
+        return float(self.total) / self.count if self.count else None
+
+
+class Min(Accumulator):
+    def __init__(self, *args, **kwargs):
+        super(Min, self).__init__(*args, **kwargs)
+        self.value = None
+
+    def fold(self, value):
+        if self.value is None or value < self.value:
+            self.value = value
+
+    def result(self):
+        return self.value
+
+
+class Max(Min):
+    def fold(self, value):
+        if self.value is None or value > self.value:
+            self.value = value
+
+
+# A dictionary of SQL aggregate functions and their accumulators.
+ACCUMULATORS = {
+    'COUNT': Count,
+    'SUM': Sum,
+    'AVG': Avg,
+    'MIN': Min,
+    'MAX': Max,
+}
@@ -0,0 +1,45 @@
+"""
+
+.. module:: django-ewiz.apps
+    :synopsis: django-ewiz application configuration.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.apps import AppConfig, apps
+from django.conf import settings
+from django.db import router
+
+from .metadata import get_metadata
+
+
+class EwizConfig(AppConfig):
+    name = 'django_ewiz'
+    verbose_name = "django-ewiz"
+
+    def ready(self):
+        """Builds the metadata of every model read from an ewiz database up front."""
+
+        ewiz_aliases = set(alias for alias, settings_dict in settings.DATABASES.items() if settings_dict.get('ENGINE') == 'django_ewiz')
+
+        if not ewiz_aliases:
+            return
+
+        for model in apps.get_models():
+            # Checking writes first keeps mirrored models from consulting their mirror's state this early
+            if router.db_for_write(model) in ewiz_aliases or router.db_for_read(model) in ewiz_aliases:
+                get_metadata(model)
@@ -21,9 +21,13 @@
 """
 
 import logging
+from time import time
 
-import requests
-
+from .decompiler import response_stats
+from .instrumentation import record
+from .metadata import get_metadata
+from .ticketcache import get_ticket_cache
+from .transport import get_session, request_headers
 from .urlbuilders import Attach
 
 
@@ -40,14 +44,14 @@ class EwizAttacher(object):
 
     def __init__(self, settings_dict, model, file_reference, file_name):
         self.settings_dict = settings_dict
-        self.table = model._meta.db_table
+        metadata = get_metadata(model)
+
+        self.model_class = metadata.model
+        self.table = metadata.table
         self.ticket_id = model.pk
         self.file = file_reference
         self.file_name = file_name
-
-        for field in model._meta.fields:
-            if field.help_text == 'file':
-                self.field_name = field.column
+        self.field_name = metadata.file_column
 
         if not self.field_name:
             raise model.DoesNotExist("The file field for this model does not exist.")
@@ -62,7 +66,15 @@ class EwizAttacher(object):
 
         self.build_url()
 
-        response = requests.put(url=self.url, data=self.file.read(), headers={'Content-Type': 'application/octet-stream'})
+        started = time()
+        response = get_session(self.settings_dict).put(url=self.url, data=self.file.read(), headers=request_headers(self.settings_dict, {'Content-Type': 'application/octet-stream'}))
+
+        record(self.model_class, self.url, time() - started, ticket_count=1, **response_stats(response))
+
+        # The ticket's file field changed, so its cached copy (if any) is out of date
+        cache = get_ticket_cache(self.settings_dict)
+        if cache is not None:
+            cache.invalidate((self.table, str(self.ticket_id)))
 
         # Close the file stream
         self.file.close()
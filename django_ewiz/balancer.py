@@ -0,0 +1,165 @@
+"""
+
+.. module:: django-ewiz.balancer
+    :synopsis: django-ewiz read load balancing across EnterpriseWizard hosts.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from threading import Lock
+from time import time
+import logging
+import random
+
+from .registry import PerDatabase
+
+# Python 2 compatibility
+try:
+    from urllib import quote
+except ImportError:
+    from urllib.parse import quote
+
+
+logger = logging.getLogger("django_ewiz")
+
+# The consecutive failures after which a host is taken out of rotation
+MAX_FAILURES = 3
+
+# The seconds a failing host is kept out of rotation
+HOST_COOLDOWN = 10
+
+
+class Host(object):
+    """The routing state of a single EnterpriseWizard host."""
+
+    def __init__(self, host, weight):
+        self.host = host
+        self.prefix = '://' + quote(host, ":/?$&='")
+        self.weight = float(weight)
+        self.outstanding = 0
+        self.failures = 0
+        self.down_until = 0.0
+
+    @property
+    def load(self):
+        return (self.outstanding + 1) / self.weight
+
+
+class Balancer(object):
+    """
+
+    Spreads read requests across several EnterpriseWizard hosts.
+
+    Each request goes to the less loaded (outstanding requests relative to weight) of two randomly chosen hosts.
+    A host that fails max_failures requests in a row (no response, or a server error) is skipped for cooldown
+    seconds, after which it is tried again. If every host is down, the one due back soonest is used.
+
+    Urls are built against the primary host (the HOST setting) and rewritten to the chosen host, so writes,
+    which aren't routed, always go to the primary.
+
+    """
+
+    def __init__(self, primary, hosts, max_failures=MAX_FAILURES, cooldown=HOST_COOLDOWN):
+        self.primary_prefix = '://' + quote(primary, ":/?$&='")
+        self.hosts = [Host(host, weight) for host, weight in hosts]
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.lock = Lock()
+
+    def acquire(self, exclude=None):
+        """
+
+        Chooses the host of a request and counts the request as outstanding on it.
+
+        :param exclude: A host not to choose (e.g. one that just failed the request), unless it is the only host.
+
+        """
+
+        with self.lock:
+            now = time()
+            hosts = [host for host in self.hosts if host is not exclude] or self.hosts
+            candidates = [host for host in hosts if host.down_until <= now]
+
+            if not candidates:
+                candidates = [min(hosts, key=lambda host: host.down_until)]
+
+            if len(candidates) > 1:
+                candidates = random.sample(candidates, 2)
+
+            host = min(candidates, key=lambda host: host.load)
+            host.outstanding += 1
+
+            return host
+
+    def release(self, host, failed=False):
+        """Reports the outcome of a request sent to host."""
+
+        with self.lock:
+            host.outstanding -= 1
+
+            if not failed:
+                host.failures = 0
+                return
+
+            host.failures += 1
+
+            if host.failures >= self.max_failures:
+                if host.down_until <= time():
+                    logger.warning("Taking %s out of rotation for %ds after %d failed requests.", host.host, self.cooldown, host.failures)
+
+                host.down_until = time() + self.cooldown
+
+    def route(self, url, host):
+        """Rewrites a url built against the primary host to host."""
+
+        return url.replace(self.primary_prefix, host.prefix, 1)
+
+
+balancers = PerDatabase()
+
+
+def get_hosts(settings_dict):
+    """
+
+    Returns the (host, weight) pairs described by the HOSTS setting, or None if it isn't set.
+
+    Each entry is a host (with a weight of 1) or a (host, weight) pair.
+
+    """
+
+    hosts = settings_dict.get('HOSTS')
+
+    if not hosts:
+        return None
+
+    return [tuple(entry) if isinstance(entry, (list, tuple)) else (entry, 1) for entry in hosts]
+
+
+def get_balancer(settings_dict):
+    """
+
+    Returns the balancer shared by every query of the database described by settings_dict,
+    or None if HOSTS isn't set.
+
+    """
+
+    hosts = get_hosts(settings_dict)
+
+    if not hosts:
+        return None
+
+    return balancers.get(settings_dict, lambda: Balancer(settings_dict["HOST"], hosts))
@@ -20,21 +20,32 @@
 
 """
 
+from collections import OrderedDict
+from functools import partial
+from itertools import islice
 import logging
 import re
+from time import time
 
+from django.db import transaction
+from django.db.models import CharField, TextField
 from django.db.models.sql.constants import SINGLE, MULTI
 from django.db.utils import DatabaseError, IntegrityError
-from django.utils.encoding import smart_str
-import requests
-
 from djangotoolbox.db.basecompiler import (NonrelQuery, NonrelCompiler, NonrelInsertCompiler, NonrelUpdateCompiler, NonrelDeleteCompiler)
 
-from .decompiler import EwizDecompiler
-from .urlbuilders import Select, Update, Insert
+from .aggregates import ACCUMULATORS
+from .decompiler import EwizDecompiler, response_stats, decode_lines
+from .instrumentation import record
+from .metadata import get_metadata
+from .prefetch import PREFETCH_MAX_PAGE_SIZE, get_prefetcher
+from .ticketcache import get_ticket_cache
+from .transport import send_write
+from .urlbuilders import Select, Update, Insert, redact
+from .writebehind import get_queue
 
 
 MAX_LIMIT = '9223372036854775807'  # Max limit as proposed by MySQL / 2 (for some reason...)
+IN_CHUNK_SIZE = 200  # Default maximum number of values rendered into a single IN (...) clause
 
 logging.getLogger("django_ewiz")
 
@@ -88,6 +99,19 @@ class EwizQuery(NonrelQuery):
         'isnull': lambda lookup_type, value: ("IS NOT NULL", None),
     }
 
+    # A dictionary of operators that are evaluated locally, on each candidate ticket, and their predicates.
+    local_operators = {
+        'exact': lambda value: lambda ticket_value: ticket_value == value,
+        'contains': lambda value: lambda ticket_value: value in ticket_value,
+        'startswith': lambda value: lambda ticket_value: ticket_value.startswith(value),
+        'endswith': lambda value: lambda ticket_value: ticket_value.endswith(value),
+        'regex': lambda value: re.compile(value).search,
+        'iregex': lambda value: re.compile(value, re.IGNORECASE).search,
+    }
+
+    # Lookups the server can't narrow down at all (the anti-sql block rejects them).
+    local_only_lookups = ('regex', 'iregex')
+
     def __init__(self, compiler, fields):
         super(EwizQuery, self).__init__(compiler, fields)
         self.compiled_query = {
@@ -98,13 +122,15 @@ class EwizQuery(NonrelQuery):
                 'offset': '0',
                 'limit': MAX_LIMIT
             },
+            'chunked_filter': None,
+            'residual_filters': [],
         }
 
     def _debug(self):
         return ('DEBUG INFO:' +
                 '\n\nRAW_QUERY: ' + str(self.query) +
                 '\nCOMPILED_QUERY: ' + str(self.compiled_query) +
-                '\nQUERY_URL: ' + str(Select(self.connection.settings_dict, self.query.model._meta.db_table, self.compiled_query).build())
+                '\nQUERY_URL: ' + str(Select(self.connection.settings_dict, get_metadata(self.query.model).table, self.compiled_query).build())
                 )
 
     def fetch(self, low_mark=0, high_mark=None):
@@ -120,6 +146,110 @@ class EwizQuery(NonrelQuery):
 
         """
 
+        decompiler = EwizDecompiler(self.query.model, self.connection.settings_dict, self.connection)
+        columns = self._get_columns(self.fields)
+        residual = self._get_residual()
+        prefetcher = get_prefetcher(self.connection.settings_dict)
+
+        pk_column = self.query.model._meta.pk.column
+
+        # Stream the results, only parsing the selected fields
+        if residual is None and columns == set([pk_column]):
+            # Selecting only the primary key needs no ticket reads
+            query_results = ({pk_column: ticket_id} for ticket_id in self._select_ids(decompiler, low_mark, high_mark))
+        elif prefetcher is not None and residual is None and not self.compiled_query["chunked_filter"] and high_mark is not None \
+                and 0 < high_mark - low_mark <= int(self.connection.settings_dict.get('PREFETCH_MAX_PAGE_SIZE') or PREFETCH_MAX_PAGE_SIZE):
+            query_results = self._fetch_page(decompiler, prefetcher, low_mark, high_mark, columns)
+        elif residual is None:
+            query_results = decompiler.iterate(self._select_ids(decompiler, low_mark, high_mark), columns)
+        else:
+            # Locally evaluated filters can't be limited by the server, so slice the matching tickets instead
+            query_results = islice(decompiler.iterate(self._select_ids(decompiler), columns, residual), low_mark, high_mark)
+
+        for result in query_results:
+            yield result
+
+    def aggregate(self, group_fields, accumulators):
+        """
+
+        EwizQueryAggregator
+
+        Streams every ticket matching the query through a set of accumulators per group, parsing only the
+        grouped and aggregated fields. Only the accumulators are held in memory, never the tickets.
+
+        :param group_fields: The fields to group by (an empty list aggregates every ticket into a single group).
+        :param accumulators: A list of callables that each return a new Accumulator.
+        :returns: A list of (group values, aggregate results) tuples, in the order each group was first seen.
+
+        """
+
+        decompiler = EwizDecompiler(self.query.model, self.connection.settings_dict, self.connection)
+        id_list = self._select_ids(decompiler)
+
+        group_columns = [field.column for field in group_fields]
+        columns = self._get_columns(group_fields).union(accumulator().column for accumulator in accumulators) - set([None])
+        groups = OrderedDict()
+
+        for ticket in decompiler.iterate(id_list, columns, self._get_residual()):
+            key = tuple(ticket.get(column) for column in group_columns)
+
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [accumulator() for accumulator in accumulators]
+
+            for accumulator in group:
+                accumulator.add(ticket)
+
+        # Aggregating an empty result set without grouping still yields a single row
+        if not groups and not group_fields:
+            groups[()] = [accumulator() for accumulator in accumulators]
+
+        return [(key, [accumulator.result() for accumulator in group]) for key, group in groups.items()]
+
+    def _fetch_page(self, decompiler, prefetcher, low_mark, high_mark, columns):
+        """
+
+        Fetches the page of tickets between low_mark and high_mark, using the prefetched page if there is one.
+        If the page follows the last page fetched of the same query, the page that follows it is prefetched in the
+        background, so that one-off slices (e.g. first()) don't cost a speculative fetch.
+
+        """
+
+        columns = frozenset(columns)
+        query = (redact(self._build_select_url()), columns)
+        url = self._build_select_url(low_mark, high_mark)
+        page = prefetcher.take((redact(url), columns))
+
+        # Speculatively fetch the next page while this one is being consumed
+        if prefetcher.advance(query, low_mark, high_mark):
+            next_url = self._build_select_url(high_mark, 2 * high_mark - low_mark)
+
+            def fetch_next_page():
+                count, id_list = decompiler.select(next_url)
+                return decompiler.read(id_list, columns)
+
+            prefetcher.prefetch((redact(next_url), columns), fetch_next_page)
+
+        if page is None:
+            count, id_list = decompiler.select(url)
+            page = decompiler.iterate(id_list, columns)
+
+        return page
+
+    def _select_ids(self, decompiler, low_mark=0, high_mark=None):
+        """Requests the ids of the tickets between low_mark and high_mark that match the query."""
+
+        # Oversized IN filters are split into several selects and sliced locally
+        if self.compiled_query["chunked_filter"]:
+            return self._select_chunked_ids(decompiler)[low_mark:high_mark]
+
+        count, id_list = decompiler.select(self._build_select_url(low_mark, high_mark))
+
+        return id_list
+
+    def _build_select_url(self, low_mark=0, high_mark=None):
+        """Builds the select url of the tickets between low_mark and high_mark that match the query."""
+
         # Handle all records requests
         if not self.compiled_query["filters"]:
             self.compiled_query["filters"] = ["id LIKE '%'"]
@@ -138,14 +268,7 @@ class EwizQuery(NonrelQuery):
             self.compiled_query["limits"]["limit"] = str(0)
 
         # Build the url
-        url = Select(self.connection.settings_dict, self.query.model._meta.db_table, self.compiled_query).build()
-
-        # Fetch and decompiler the results
-        query_results = EwizDecompiler(self.query.model, self.connection.settings_dict).decompile(url)
-
-        # Yield each result
-        for result in query_results:
-            yield result
+        return Select(self.connection.settings_dict, get_metadata(self.query.model).table, self.compiled_query).build()
 
     def count(self, limit=None):
         """
@@ -158,17 +281,93 @@ class EwizQuery(NonrelQuery):
 
         """
 
+        # Locally evaluated filters must be counted by reading every candidate ticket
+        residual = self._get_residual()
+        if residual is not None:
+            decompiler = EwizDecompiler(self.query.model, self.connection.settings_dict, self.connection)
+            query_results = decompiler.iterate(self._select_ids(decompiler), self._get_columns([]), residual)
+
+            return sum(1 for result in islice(query_results, limit))
+
+        # Oversized IN filters must be counted from the merged id list
+        if self.compiled_query["chunked_filter"]:
+            id_list = self._select_chunked_ids(EwizDecompiler(self.query.model, self.connection.settings_dict, self.connection))
+
+            return len(id_list[:limit])
+
         # Pass given limit to the compiled query
         if limit:
             self.compiled_query["limits"]["limit"] = str(limit)
 
         # Build the url
-        url = Select(self.connection.settings_dict, self.query.model._meta.db_table, self.compiled_query).build()
+        url = Select(self.connection.settings_dict, get_metadata(self.query.model).table, self.compiled_query).build()
         # Send the query, but only fetch and decompile the result count
-        count = EwizDecompiler(self.query.model, self.connection.settings_dict).count(url)
+        count = EwizDecompiler(self.query.model, self.connection.settings_dict, self.connection).count(url)
 
         return count
 
+    def _select_chunked_ids(self, decompiler):
+        """
+
+        Splits the chunked IN filter into several select urls, each constrained by the remaining filters,
+        and concurrently requests their ticket ids.
+
+        This method returns the merged, de-duplicated list of ticket ids, in ticket id order.
+
+        """
+
+        column, values = self.compiled_query["chunked_filter"]
+        chunk_size = self._get_in_chunk_size()
+        table = get_metadata(self.query.model).table
+
+        url_list = []
+        for index in range(0, len(values), chunk_size):
+            operator, value = self.operators['in']('in', values[index:index + chunk_size])
+
+            chunk_query = {
+                'table': self.compiled_query["table"],
+                'filters': self.compiled_query["filters"] + [column + ' ' + operator + ' ' + value],
+                'ordering': self.compiled_query["ordering"],
+                'limits': {
+                    'offset': '0',
+                    'limit': MAX_LIMIT
+                },
+            }
+
+            url_list.append(Select(self.connection.settings_dict, table, chunk_query).build())
+
+        return decompiler.select_many(url_list)
+
+    def _get_columns(self, fields):
+        """Returns the columns to parse out of each ticket: those of fields and those the residual filters test."""
+
+        return set([field.column for field in fields] + [column for column, predicate, negated in self.compiled_query["residual_filters"]])
+
+    def _get_residual(self):
+        """
+
+        Returns the predicate that a ticket must satisfy to match the filters the server couldn't (fully) apply,
+        or None if there are no such filters.
+
+        """
+
+        residual_filters = self.compiled_query["residual_filters"]
+
+        if not residual_filters:
+            return None
+
+        def residual(ticket):
+            for column, predicate, negated in residual_filters:
+                if bool(predicate(ticket.get(column) or '')) == negated:
+                    return False
+
+            return True
+
+        return residual
+
+    def _get_in_chunk_size(self):
+        return int(self.connection.settings_dict.get('IN_CHUNK_SIZE') or IN_CHUNK_SIZE)
+
     def delete(self):
         raise NotImplementedError("Deleting EnterpriseWizard records is generally ill-advised. Please contact your EnterpriseWizard administrator for more information.")
 
@@ -217,6 +416,24 @@ class EwizQuery(NonrelQuery):
 
         """
 
+        # Compile lookups the server can't apply (case-sensitively) into residual filters, evaluated on each candidate ticket.
+        # Only text is compared locally: other values don't compare as strings (e.g. Decimal('1.50') against '1.5').
+        case_sensitive = self.connection.settings_dict.get('CASE_SENSITIVE_LOOKUPS') and isinstance(field, (CharField, TextField))
+
+        if lookup_type in self.local_only_lookups or (lookup_type in self.local_operators and case_sensitive):
+            try:
+                predicate = self.local_operators[lookup_type](str(value))
+            except re.error as message:
+                raise DatabaseError("Invalid regular expression %r: %s" % (value, message))
+
+            self.compiled_query["residual_filters"].append((field.column, predicate, negated))
+
+            # A non-negated case-insensitive server lookup still narrows down the candidates
+            if negated or lookup_type in self.local_only_lookups:
+                return
+
+            lookup_type = 'i' + lookup_type
+
         # Determine operator
         if negated:
             try:
@@ -229,6 +446,11 @@ class EwizQuery(NonrelQuery):
             except KeyError:
                 raise DatabaseError("Lookup type %r isn't supported" % lookup_type)
 
+        # Defer oversized IN filters so that they can be split into several selects
+        if lookup_type == 'in' and not negated and not self.compiled_query["chunked_filter"] and len(value) > self._get_in_chunk_size():
+            self.compiled_query["chunked_filter"] = (field.column, list(value))
+            return
+
         # Handle lambda lookup types
         if callable(operator):
             operator, value = operator(lookup_type, value)
@@ -250,58 +472,128 @@ class EwizCompiler(NonrelCompiler):
     def execute_sql(self, result_type=MULTI):
         """
 
-        Handles SQL-like aggregate queries. This method emulates COUNT
-        by using the NonrelQuery.count method.
+        Handles SQL-like aggregate queries. COUNT(*) is emulated by using the NonrelQuery.count method,
+        every other aggregate is computed by streaming the matching tickets through the EwizQuery.aggregate method.
 
         """
 
         self.pre_sql_setup()
 
+        aggregates = self._get_aggregates()
+
+        if aggregates:
+            # Simulate a count().
+            if len(aggregates) == 1 and not self._get_group_fields() and self._is_count_star(aggregates[0]):
+                count = self.get_count()
+                if result_type is SINGLE:
+                    return [count]
+                elif result_type is MULTI:
+                    return [[count]]
+
+            rows = self._aggregate(aggregates)
+            if result_type is SINGLE:
+                return rows[0] if rows else None
+            elif result_type is MULTI:
+                return rows
+
+    def get_fields(self):
+        """Returns the fields to load, reading the Col expressions Django 1.8+ selects (e.g. for values_list()), which djangotoolbox can't."""
+
+        if self.query.select and not hasattr(self.query, 'related_select_cols'):
+            return [column.target for column in self.query.select]
+
+        return super(EwizCompiler, self).get_fields()
+
+    def results_iter(self, results=None):
+        """Returns an iterator over the query results, or over its groups if the query is annotated with aggregates (e.g. values().annotate())."""
+
+        aggregates = self._get_aggregates() if results is None else None
+
+        if not aggregates:
+            for row in super(EwizCompiler, self).results_iter(results):
+                yield row
+        else:
+            for row in self._aggregate(aggregates)[self.query.low_mark:self.query.high_mark]:
+                yield row
+
+    def _aggregate(self, aggregates):
+        """Computes the query's aggregates for each group. Each returned row holds the group's values followed by the aggregate results."""
+
+        group_fields = self._get_group_fields()
+        accumulators = []
+
+        for aggregate in aggregates:
+            function = self._get_aggregate_function(aggregate)
+
+            try:
+                accumulator = ACCUMULATORS[function]
+            except KeyError:
+                raise NotImplementedError("The database backend doesn't support %s() queries." % function)
+
+            accumulators.append(partial(accumulator, self._get_aggregate_source(aggregate), self._is_aggregate_distinct(aggregate)))
+
+        rows = []
+        for key, results in self.build_query(group_fields).aggregate(group_fields, accumulators):
+            group = self._make_result(dict(zip([field.column for field in group_fields], key)), group_fields)
+            rows.append(group + results)
+
+        return rows
+
+    def _get_aggregates(self):
         try:
             aggregates = self.query.annotation_select.values()
         except AttributeError:
             aggregates = self.query.aggregate_select.values()
 
-        # Simulate a count().
-        if aggregates:
-            aggregates = list(aggregates)
-            assert len(aggregates) == 1
-            aggregate = aggregates[0]
+        return list(aggregates)
 
-            is_count = True
+    def _get_group_fields(self):
+        """Returns the fields the query is grouped by (all selected fields if the query is grouped at all)."""
 
-            try:
-                if aggregate.function != 'COUNT':
-                    is_count = False
-            except AttributeError:
-                if aggregate.sql_function != 'COUNT':
-                    is_count = False
+        if getattr(self.query, 'group_by', None) is None:
+            return []
 
-            if not is_count:
-                raise NotImplementedError("The database backend only supports count() queries.")
+        return list(self.get_fields())
+
+    def _get_aggregate_function(self, aggregate):
+        try:
+            return aggregate.function
+        except AttributeError:
+            return aggregate.sql_function
 
-            opts = self.query.get_meta()
+    def _get_aggregate_source(self, aggregate):
+        """Returns the field an aggregate is computed over, or None for '*'."""
 
-            try:
-                try:
-                    from django.db.models.expressions import Star
+        try:
+            source = aggregate.get_source_expressions()[0]
+        except AttributeError:
+            # Django < 1.8
+            return None if aggregate.col == '*' else aggregate.source
 
-                    try:
-                        is_star = isinstance(aggregate.input_field, Star)  # Django 1.8.5+
-                    except AttributeError:
-                        is_star = isinstance(aggregate.get_source_expressions()[0], Star)  # Django 1.9
-                except ImportError:
-                    is_star = aggregate.input_field.value == '*'
+        try:
+            from django.db.models.expressions import Star
 
-                assert is_star or aggregate.input_field == (opts.db_table, opts.pk.column)  # Fair warning: the latter part of this or statement hasn't been tested
-            except AttributeError:
-                assert aggregate.col == '*' or aggregate.col == (opts.db_table, opts.pk.column)
+            is_star = isinstance(source, Star)  # Django 1.8.5+
+        except ImportError:
+            is_star = getattr(source, 'value', None) == '*'
 
-            count = self.get_count()
-            if result_type is SINGLE:
-                return [count]
-            elif result_type is MULTI:
-                return [[count]]
+        if is_star:
+            return None
+
+        return getattr(source, 'target', None) or source.output_field
+
+    def _is_aggregate_distinct(self, aggregate):
+        return bool(getattr(aggregate, 'extra', {}).get('distinct'))
+
+    def _is_count_star(self, aggregate):
+        """Checks whether an aggregate counts every ticket, i.e. COUNT(*) or COUNT(pk)."""
+
+        if self._get_aggregate_function(aggregate) != 'COUNT' or self._is_aggregate_distinct(aggregate):
+            return False
+
+        source = self._get_aggregate_source(aggregate)
+
+        return source is None or source.primary_key
 
 
 class EwizInsertCompiler(NonrelInsertCompiler, EwizCompiler):
@@ -353,12 +645,19 @@ class EwizInsertCompiler(NonrelInsertCompiler, EwizCompiler):
     def insert(self, values, return_id):
         """Builds and sends a query to create a new ticket in the Ewiz database."""
 
-        # Build the url
-        url = Insert(self.connection.settings_dict, self.query.model._meta.db_table, values).build()
+        # Build the request
+        import requests
+
+        metadata = get_metadata(self.query.model)
+        builder = Insert(self.connection.settings_dict, metadata.table, values, metadata)
 
         # Attempt the Insert
+        started = time()
+
         try:
-            response = requests.get(url)
+            url, response = send_write(self.connection.settings_dict, builder)
+
+            record(self.query.model, url, time() - started, ticket_count=1, connection=self.connection, **response_stats(response))
 
             if response.status_code != 200:
                 raise requests.exceptions.HTTPError(str(response.content))
@@ -367,8 +666,8 @@ class EwizInsertCompiler(NonrelInsertCompiler, EwizCompiler):
             if return_id:
                 pattern = re.compile(r"^EWREST_id='(?P<value>.*)';$", re.DOTALL)
 
-                line = next(response.iter_lines(decode_unicode=True))
-                new_id = pattern.match(smart_str(line)).group('value')
+                line = decode_lines(response, self.connection.settings_dict, first_only=True)[0]
+                new_id = pattern.match(line).group('value')
 
                 return int(new_id)
 
@@ -401,15 +700,45 @@ class EwizUpdateCompiler(NonrelUpdateCompiler):
                 except:
                     raise DatabaseError('UPDATE COMPILER: UPDATE ticketID assumptions were wrong. Contact Alex Kavanaugh with details.')
 
-        url = Update(self.connection.settings_dict, self.query.model._meta.db_table, ticketID, values).build()
+        settings_dict = self.connection.settings_dict
+
+        # Queue the update to be merged with other updates of the ticket and sent in the background
+        if settings_dict.get('WRITE_BEHIND'):
+            get_queue(settings_dict).enqueue((get_metadata(self.query.model).table, str(ticketID)), values, partial(self.send_update, ticketID))
+
+            # Flush when the surrounding transaction (if any) of the given database commits
+            commit_using = settings_dict.get('WRITE_BEHIND_FLUSH_ON_COMMIT')
+            if commit_using:
+                transaction.on_commit(get_queue(settings_dict).wake, using=commit_using)
+
+            return 1  # Django expects a pass/fail response
+
+        return self.send_update(ticketID, values)
+
+    def send_update(self, ticketID, values):
+        """Sends an update of the given (field, value) pairs of a ticket to the Ewiz database."""
+
+        import requests
+
+        metadata = get_metadata(self.query.model)
+        builder = Update(self.connection.settings_dict, metadata.table, ticketID, values, metadata)
 
         # Attempt the Update
+        started = time()
+
         try:
-            requests.get(url)
+            url, response = send_write(self.connection.settings_dict, builder)
+
+            record(self.query.model, url, time() - started, ticket_count=1, connection=self.connection, **response_stats(response))
         except requests.exceptions.HTTPError as message:
             raise DatabaseError(self.query.model._meta.object_name + ' - An UPDATE error has occurred. Please contact the development team with the following details:\n\t' + str(message))
         else:
             return 1  # Django expects a pass/fail response
+        finally:
+            # Whether or not the update went through, the ticket's cached copy may be out of date
+            cache = get_ticket_cache(self.connection.settings_dict)
+            if cache is not None:
+                cache.invalidate((metadata.table, str(ticketID)))
 
 
 class EwizDeleteCompiler(NonrelDeleteCompiler):
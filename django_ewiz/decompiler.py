@@ -20,14 +20,21 @@
 
 """
 
+from collections import deque
 import logging
 import re
+from threading import Event, Lock
+from time import time
 
 from django.db.utils import DatabaseError
-from django.utils.encoding import smart_str
-import requests
 
-from .urlbuilders import Read
+from .balancer import get_balancer
+from .instrumentation import record
+from .limiter import get_limiter
+from .metadata import get_metadata
+from .ticketcache import get_ticket_cache
+from .transport import get_session, request_headers
+from .urlbuilders import Read, Select, redact
 
 
 # Python 2 compatibility
@@ -35,16 +42,93 @@ try:
     from urllib import unquote
 except ImportError:
     from urllib.parse import unquote
-try:
-    from concurrent.futures import ThreadPoolExecutor
-    threading = True
-except ImportError:
-    threading = False
 
 
 logging.getLogger("django_ewiz")
 
 
+def response_stats(response):
+    """Returns the decoded and on-the-wire (possibly compressed) sizes and the status code of a response."""
+
+    response_bytes = len(response.content)
+
+    return {
+        'response_bytes': response_bytes,
+        'wire_bytes': int(response.headers.get('Content-Length') or response_bytes),
+        'status_code': response.status_code,
+    }
+
+
+def decode_lines(response, settings_dict, first_only=False):
+    """
+
+    Decodes a (decompressed) response body in a single pass and splits it into non-empty lines.
+
+    The body is decoded using the CHARSET setting, the charset sent by the server or UTF-8, in that order.
+    If first_only is True, only the first line is decoded.
+
+    """
+
+    content = response.content
+
+    if first_only:
+        content = content.split(b'\n', 1)[0]
+
+    text = content.decode(settings_dict.get('CHARSET') or response.encoding or 'utf-8', 'replace')
+
+    return [line for line in (line.rstrip('\r') for line in text.split('\n')) if line]
+
+
+class SingleFlight(object):
+    """
+
+    Coalesces identical in-flight calls
+
+    The first caller of a key runs the call while every concurrent caller of the same key waits for, and shares, its result.
+    do() returns a (result, shared) tuple, where shared is True for callers that waited on another caller's call.
+
+    """
+
+    class Call(object):
+        def __init__(self):
+            self.done = Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self.lock = Lock()
+        self.calls = {}
+
+    def do(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = self.calls[key] = self.Call()
+
+        if leader:
+            try:
+                call.result = func()
+            except Exception as error:
+                call.error = error
+            finally:
+                with self.lock:
+                    del self.calls[key]
+
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+
+        return call.result, not leader
+
+
+in_flight = SingleFlight()
+
+
 class EwizDecompiler(object):
     """
 
@@ -54,9 +138,10 @@ class EwizDecompiler(object):
 
     """
 
-    def __init__(self, model, settings_dict):
+    def __init__(self, model, settings_dict, connection=None):
         self.model = model
         self.settings_dict = settings_dict
+        self.connection = connection
 
     def decompile(self, url):
         """
@@ -67,13 +152,9 @@ class EwizDecompiler(object):
 
         """
 
-        count, response_list = self.__request_multiple(url)
-        query_list = []
+        count, id_list = self.select(url)
 
-        for response in response_list:
-            query_list.append(self.__decompile(response))
-
-        return query_list
+        return self.read(id_list)
 
     def count(self, url):
         """
@@ -84,28 +165,305 @@ class EwizDecompiler(object):
 
         """
 
-        count, response_list = self.__request_multiple(url, count_only=True)
+        count, response_list = self.__request('count', url, lambda stats: self.__request_multiple(url, stats, count_only=True),
+                                              ticket_count=lambda result: int(result[0]))
 
         return count
 
-    def __attempt_request(self, url):
+    def select(self, url, pool_wait=0.0):
+        """
+
+        Requests tickets given a query url and parses the ticket count and ticket ids without reading any tickets.
+
+        This method returns a (count, id_list) tuple.
+
+        """
+
+        count, id_list = self.__request('select', url, lambda stats: self.__request_multiple(url, stats),
+                                        ticket_count=lambda result: result[0], pool_wait=pool_wait)
+
+        return count, list(id_list)
+
+    def select_many(self, url_list):
+        """
+
+        Requests the ticket ids of several query urls concurrently.
+
+        The id lists are merged into a single de-duplicated list in ticket id order, the order a single select returns them in.
+
+        """
+
+        merged = set()
+
+        for count, partial_id_list in self.__map(self.select, url_list):
+            merged.update(partial_id_list)
+
+        return sorted(merged, key=int)
+
+    def read(self, id_list, columns=None):
+        """
+
+        Requests and parses each ticket in id_list.
+
+        This method returns a list of field, value dictionaries. Each dictionary represents a ticket.
+
+        """
+
+        return list(self.iterate(id_list, columns))
+
+    def iterate(self, id_list, columns=None, predicate=None):
+        """
+
+        Requests and parses each ticket in id_list, yielding them in order as they arrive.
+
+        At most twice NUM_CONNECTIONS (or MAX_CONNECTIONS) tickets are held in memory at once. If columns is given, only those
+        fields are parsed out of each ticket. If predicate is given, only the tickets it returns True for are yielded.
+
+        If MAX_CONNECTIONS is set, the number of concurrent reads is adapted to the server's latency by the database's limiter.
+
+        If TICKET_CACHE_TIMEOUT is set, tickets are read through the database's ticket cache (see __read_cached).
+
+        """
+
+        table = get_metadata(self.model).table
+        limiter = get_limiter(self.settings_dict)
+        cache = get_ticket_cache(self.settings_dict)
+
+        if columns is not None:
+            columns = frozenset(columns)
+            kind = ('read', columns)
+        else:
+            kind = 'read'
+
+        def read_ticket(ticket_id, pool_wait=0.0):
+            response_url = Read(self.settings_dict, table, ticket_id).build()
+
+            if cache is None:
+                return dict(self.__request(kind, response_url, lambda stats: self.__decompile(self.__request_single(response_url, stats), columns),
+                                           ticket_count=lambda result: 1, pool_wait=pool_wait, limiter=limiter))
+
+            key = (table, str(ticket_id))
+            entry = cache.get(key)
+
+            if entry is not None and entry.is_fresh():
+                ticket = entry.ticket
+
+                # Nothing is sent, but the read still shows up in the instrumentation
+                record(self.model, response_url, 0.0, ticket_count=1, pool_wait=pool_wait, cache_hit=True, connection=self.connection)
+            else:
+                # Cached tickets are parsed in full, whatever the columns
+                ticket = self.__request('read', response_url, lambda stats: self.__read_cached(response_url, key, cache, stats),
+                                        ticket_count=lambda result: 1, pool_wait=pool_wait, limiter=limiter)
+
+            if columns is None:
+                return dict(ticket)
+
+            return dict((column, value) for column, value in ticket.items() if column in columns)
+
+        results = self.__imap(read_ticket, id_list)
+
+        if predicate is not None:
+            return (result for result in results if predicate(result))
+
+        return results
+
+    def __map(self, func, iterable):
+        """Maps func over iterable, using a pool of NUM_CONNECTIONS threads if available (see __imap)."""
+
+        return list(self.__imap(func, iterable))
+
+    def __imap(self, func, iterable):
+        """
+
+        Lazily maps func over iterable in order, using a pool of NUM_CONNECTIONS threads if available.
+
+        No more than twice NUM_CONNECTIONS calls are submitted ahead of the results being consumed. func is passed
+        the seconds each item spent waiting for a free thread as its pool_wait keyword argument.
+
+        """
+
+        num_connections = self.settings_dict.get('MAX_CONNECTIONS') or self.settings_dict.get('NUM_CONNECTIONS')
+
+        if num_connections:
+            # Python 2 compatibility (without the futures backport)
+            try:
+                from concurrent.futures import ThreadPoolExecutor
+            except ImportError:
+                num_connections = None
+
+        if num_connections:
+            def timed(item, submitted):
+                return func(item, pool_wait=time() - submitted)
+
+            with ThreadPoolExecutor(num_connections) as pool:
+                futures = deque()
+
+                for item in iterable:
+                    futures.append(pool.submit(timed, item, time()))
+
+                    if len(futures) >= 2 * int(num_connections):
+                        yield futures.popleft().result()
+
+                while futures:
+                    yield futures.popleft().result()
+        else:
+            for item in iterable:
+                yield func(item)
+
+    def __request(self, kind, url, func, ticket_count, pool_wait=0.0, limiter=None):
+        """
+
+        Runs func through the in-flight request coalescer, keyed on the request kind and the url minus its password,
+        and records the request's instrumentation.
+
+        func is passed a dictionary to fill with the response's statistics. Waiters share the parsed result, so callers
+        must copy it before handing it out. Coalescing can be disabled by setting COALESCE_REQUESTS to False.
+
+        If a limiter is given, the request waits for a slot under its limit and reports its latency and outcome to it.
+        Requests that share another request's response only free their slot: the request that was sent reports for them.
+
+        """
+
+        stats = {}
+        extra = {}
+
+        if limiter is not None:
+            pool_wait += limiter.acquire()
+            extra['concurrency_limit'] = limiter.current_limit
+
+        # Set if func is run by this request rather than shared from an identical one
+        sent = []
+
+        def send():
+            sent.append(True)
+            return func(stats)
+
+        started = time()
+
+        try:
+            if self.settings_dict.get('COALESCE_REQUESTS', True) is False:
+                result, shared = send(), False
+            else:
+                result, shared = in_flight.do((kind, redact(url)), send)
+        except Exception as error:
+            duration = time() - started
+
+            # Only server errors (or no response at all) signal an overloaded server
+            if limiter is not None:
+                limiter.release(duration, failed=stats.get('status_code') is None or stats['status_code'] >= 500, sample=bool(sent))
+
+            record(self.model, url, duration, pool_wait=pool_wait, coalesced=not sent, error=error, connection=self.connection, **dict(stats, **extra))
+            raise
+
+        duration = time() - started
+
+        if limiter is not None:
+            limiter.release(duration, sample=not shared)
+
+        record(self.model, url, duration, ticket_count=ticket_count(result), pool_wait=pool_wait, coalesced=shared,
+               connection=self.connection, **dict(stats, **extra))
+
+        return result
+
+    def __read_cached(self, url, key, cache, stats):
+        """
+
+        Reads a ticket into the ticket cache, revalidating an expired copy of it instead if possible.
+
+        If the server sent an ETag or Last-Modified header with the cached copy, the read is made conditional on the
+        ticket having changed, and a 304 response keeps the cached copy without downloading or parsing the ticket again.
+        Otherwise, if MODIFIED_COLUMN is set, a select of the ticket's id and cached modification time checks whether it
+        changed before the ticket is read; the select is recorded as a request of its own. Revalidated reads are
+        reported with revalidated=True.
+
+        """
+
+        entry = cache.get(key)
+        modified_column = self.settings_dict.get('MODIFIED_COLUMN')
+        headers = None
+
+        if entry is not None:
+            headers = entry.conditional_headers()
+
+            if not headers and modified_column and entry.modified is not None and self.__is_unmodified(key, modified_column, entry.modified):
+                cache.refresh(entry)
+                stats['revalidated'] = True
+
+                return entry.ticket
+
+        response = self.__attempt_request(url, stats, headers)
+
+        if entry is not None and response.status_code == 304:
+            cache.refresh(entry)
+            stats['revalidated'] = True
+
+            return entry.ticket
+
+        ticket = self.__decompile(response)
+        cache.set(key, ticket, etag=response.headers.get('ETag'), last_modified=response.headers.get('Last-Modified'),
+                  modified=ticket.get(modified_column) if modified_column else None)
+
+        return ticket
+
+    def __is_unmodified(self, key, modified_column, modified):
+        """
+
+        Returns True if the ticket of key still has the given modification time, using a select of its id.
+
+        The select is recorded as an EWSelect with statistics of its own, so they aren't counted as the read's.
+
+        """
+
+        table, ticket_id = key
+        url = Select(self.settings_dict, table, {
+            'filters': ["id = '" + ticket_id + "'", modified_column + " = '" + modified + "'"],
+            'ordering': ['id ASC'],
+            'limits': {'offset': '0', 'limit': '1'},
+        }).build()
+
+        select_stats = {}
+        started = time()
+
+        try:
+            count, id_list = self.__request_multiple(url, select_stats, count_only=True)
+        except Exception as error:
+            record(self.model, url, time() - started, error=error, connection=self.connection, **select_stats)
+            raise
+
+        record(self.model, url, time() - started, ticket_count=int(count), connection=self.connection, **select_stats)
+
+        return int(count) > 0
+
+    def __attempt_request(self, url, stats, headers=None):
         """
 
         Attempts to submit a request to the server via its REST interface.
 
         :param url: The url to send a request.
         :type url: str
+        :param stats: A dictionary to fill with the response's size and status code.
+        :type stats: dict
+        :param headers: Extra headers to send with the request.
+        :type headers: dict
         :returns: The server's response.
         :raises: DatabaseError if the request fails.
 
         """
 
-        response = requests.get(url)
+        import requests
+
+        try:
+            response = self.__send(url, stats, headers)
+        except requests.exceptions.RequestException as message:
+            raise DatabaseError("An error occured while attempting to reach the database:\n\t" + redact(str(message)))
+
+        stats.update(response_stats(response))
 
         try:
             response.raise_for_status()
         except requests.exceptions.HTTPError as message:
-            message = str(message)
+            # The message includes the url, password and all
+            message = redact(str(message))
 
             if "Error executing query, please consult logs" in message:
                 message = message + ".\n\tThe query submitted most likely contains invalid or illegal syntax:\n\t %s" % unquote(url.split("&$lang=")[-1][2:])
@@ -114,65 +472,91 @@ class EwizDecompiler(object):
 
         return response
 
-    def __request_multiple(self, url, count_only=False):
+    def __send(self, url, stats, headers=None):
         """
 
-        Parses a multiple ticket response into a list of responses (one for each ticket) and a count the number of tickets returned.
+        Sends a read request, to one of the HOSTS (noting it in stats) if several are configured.
 
-        Returns either the list of ticket responses or the count of tickets returned, depending on countOnly's value.
+        Reads are idempotent, so a read routed to a host that doesn't respond is retried once on another host.
+
+        :raises: requests.exceptions.RequestException if no response is received.
 
         """
 
-        response = self.__attempt_request(url)
+        import requests
 
-        pattern = re.compile(r"^EWREST_id_.* = '(?P<value>.*)';$", re.DOTALL)
+        session = get_session(self.settings_dict)
+        headers = request_headers(self.settings_dict, headers)
+        balancer = get_balancer(self.settings_dict)
+
+        if balancer is None:
+            return session.get(url, headers=headers)
+
+        attempts = 2 if len(balancer.hosts) > 1 else 1
+        host = None
+
+        for attempt in range(attempts):
+            host = balancer.acquire(exclude=host)
+            stats['host'] = host.host
+
+            try:
+                response = session.get(balancer.route(url, host), headers=headers)
+            except requests.exceptions.RequestException:
+                balancer.release(host, failed=True)
+
+                if attempt == attempts - 1:
+                    raise
+            else:
+                balancer.release(host, failed=response.status_code >= 500)
+                return response
+
+    def __request_multiple(self, url, stats, count_only=False):
+        """
 
-        response_list = []
+        Parses a multiple ticket response into a list of ticket ids and a count the number of tickets returned.
+
+        Returns either the list of ticket ids or only the count of tickets returned, depending on countOnly's value.
+
+        """
+
+        response = self.__attempt_request(url, stats)
+
+        pattern = re.compile(r"^EWREST_id_.* = '(?P<value>.*)';$", re.DOTALL)
 
         # Return only the count before the heavy lifting if countOnly is True
         if count_only:
-            first_line = next(response.iter_lines(decode_unicode=True))
-            count = pattern.match(smart_str(first_line)).group('value')
+            first_line = decode_lines(response, self.settings_dict, first_only=True)[0]
+            count = pattern.match(first_line).group('value')
 
-            return count, response_list
+            return count, []
         else:
             response_lines = []
 
-            for line in response.iter_lines(decode_unicode=True):
-                response_lines.append(pattern.match(smart_str(line)).group('value'))
+            for line in decode_lines(response, self.settings_dict):
+                response_lines.append(pattern.match(line).group('value'))
 
             count = int(response_lines[0])
             id_list = response_lines[1:]
 
-            def read_ticket(ticket_id):
-                response_url = Read(self.settings_dict, self.model._meta.db_table, ticket_id).build()
-                return self.__request_single(response_url)
-
-            num_connections = self.settings_dict.get('NUM_CONNECTIONS')
-            if threading and num_connections:
-                with ThreadPoolExecutor(num_connections) as pool:
-                    response_list = pool.map(read_ticket, id_list)
-            else:
-                response_list = map(read_ticket, id_list)
+        return count, id_list
 
-        return count, response_list
-
-    def __request_single(self, url):
+    def __request_single(self, url, stats):
         """Generates a response for a single ticket."""
 
-        return self.__attempt_request(url)
+        return self.__attempt_request(url, stats)
 
-    def __decompile(self, response):
-        """Parses a response into a field, value dictionary."""
+    def __decompile(self, response, columns=None):
+        """Parses a response into a field, value dictionary, skipping any field not in columns (if given)."""
 
-        data_list = []
-        for line in response.iter_lines(decode_unicode=True):
-            data_list.append(smart_str(line))
+        data_list = decode_lines(response, self.settings_dict)
 
         pattern = re.compile(r"^EWREST_(?P<key>.*?)='(?P<value>.*)';$", re.DOTALL)
 
         data_dict = {}
         for data in data_list:
+            if columns is not None and data[7:data.find("='")] not in columns:
+                continue
+
             match = pattern.match(data)
             data_dict[match.group('key')] = match.group('value')
 
@@ -0,0 +1,222 @@
+"""
+
+.. module:: django-ewiz.export
+    :synopsis: django-ewiz streaming bulk export.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from time import time
+import csv
+import json
+import logging
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+logger = logging.getLogger("django_ewiz")
+
+FORMATS = ('ndjson', 'csv', 'parquet')
+
+
+class NDJSONWriter(object):
+    """Writes each row as a JSON object on its own line."""
+
+    def __init__(self, stream, names, append=False):
+        self.stream = stream
+        self.names = names
+
+    def write(self, row):
+        self.stream.write(json.dumps(dict(zip(self.names, row)), default=str) + '\n')
+
+    def close(self):
+        self.stream.flush()
+
+
+class CSVWriter(object):
+    """Writes each row as a CSV line, preceded by a header line unless appending."""
+
+    def __init__(self, stream, names, append=False):
+        self.stream = stream
+        self.writer = csv.writer(stream)
+
+        if not append:
+            self.writer.writerow(names)
+
+    def write(self, row):
+        self.writer.writerow(['' if value is None else value for value in row])
+
+    def close(self):
+        self.stream.flush()
+
+
+class ParquetWriter(object):
+    """Buffers rows into row groups of batch_size rows and writes them to a Parquet file. Requires pyarrow."""
+
+    def __init__(self, path, names, batch_size):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImproperlyConfigured("Exporting to Parquet requires pyarrow. Run 'pip install pyarrow'.")
+
+        self.pyarrow = pyarrow
+        self.names = names
+        self.batch_size = batch_size
+        self.schema = pyarrow.schema([(name, pyarrow.string()) for name in names])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.columns = [[] for name in names]
+
+    def write(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(None if value is None else str(value))
+
+        if len(self.columns[0]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.columns[0]:
+            self.writer.write_table(self.pyarrow.Table.from_arrays([self.pyarrow.array(column, self.pyarrow.string()) for column in self.columns], schema=self.schema))
+            self.columns = [[] for name in self.names]
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def read_last_id(path, export_format, pk_name):
+    """Returns the primary key of the last row of a previous NDJSON or CSV export, or None if there is none."""
+
+    if export_format not in ('ndjson', 'csv'):
+        raise ImproperlyConfigured("Only NDJSON and CSV exports can be resumed.")
+
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return None
+
+    # Read backwards until the last complete line has been found. A partial line left by an interrupted export is cut
+    # off, so that it is neither parsed nor appended to.
+    with open(path, 'r+b') as export_file:
+        export_file.seek(0, os.SEEK_END)
+        position = end = export_file.tell()
+        tail = b''
+
+        while position and tail.count(b'\n') < 2:
+            step = min(position, 4096)
+            position -= step
+            export_file.seek(position)
+            tail = export_file.read(step) + tail
+
+        if b'\n' not in tail:
+            return None
+
+        tail = tail[:tail.rindex(b'\n') + 1]
+
+        if position + len(tail) < end:
+            logger.warning("Removing the partial last line of %s", path)
+            export_file.truncate(position + len(tail))
+
+    last_line = tail.rstrip(b'\r\n').rsplit(b'\n', 1)[-1].decode('utf-8')
+
+    if export_format == 'ndjson':
+        return json.loads(last_line)[pk_name]
+
+    with open(path, newline='') as export_file:
+        names = next(csv.reader(export_file))
+
+    row = next(csv.reader([last_line]))
+    if row == names:
+        return None
+
+    return row[names.index(pk_name)]
+
+
+def export_tickets(model, output, export_format='ndjson', fields=None, after_id=None, resume=False, using=None, batch_size=1000, progress=None):
+    """
+
+    Streams every ticket of model into an NDJSON, CSV or Parquet file.
+
+    Only the exported fields are parsed out of each ticket, tickets are read concurrently (see NUM_CONNECTIONS) and
+    no more than a bounded window of tickets (plus one Parquet row group) is held in memory at once.
+
+    :param model: The model of the EnterpriseWizard table to export.
+    :param output: A file path, or a text stream for NDJSON and CSV exports.
+    :param export_format: 'ndjson', 'csv' or 'parquet'.
+    :param fields: The names of the fields to export. Default: every field. The primary key is always exported.
+    :param after_id: Only export tickets whose primary key is greater than after_id.
+    :param resume: Continue a previous NDJSON or CSV export of output after its last exported ticket.
+    :param using: The database alias to export from.
+    :param batch_size: The number of rows between progress reports and in each Parquet row group.
+    :param progress: A callable passed the (rows, seconds) exported so far after each batch.
+    :returns: A (rows, seconds) tuple.
+
+    """
+
+    if export_format not in FORMATS:
+        raise ImproperlyConfigured("Unknown export format %r. Choose one of: %s." % (export_format, ", ".join(FORMATS)))
+
+    pk_name = model._meta.pk.name
+    names = list(fields) if fields else [field.name for field in model._meta.fields]
+    if pk_name not in names:
+        names.insert(0, pk_name)
+
+    is_path = isinstance(output, str)
+    append = False
+
+    if resume:
+        if not is_path:
+            raise ImproperlyConfigured("Only exports to a file path can be resumed.")
+
+        last_id = read_last_id(output, export_format, pk_name)
+        if last_id is not None:
+            after_id = last_id
+            append = True
+
+    queryset = model._default_manager.using(using) if using else model._default_manager.all()
+    if after_id is not None:
+        queryset = queryset.filter(pk__gt=after_id)
+
+    if export_format == 'parquet':
+        if not is_path:
+            raise ImproperlyConfigured("Parquet exports must be written to a file path.")
+
+        writer = ParquetWriter(output, names, batch_size)
+        stream = None
+    else:
+        stream = open(output, 'a' if append else 'w', newline='') if is_path else output
+        writer = (NDJSONWriter if export_format == 'ndjson' else CSVWriter)(stream, names, append)
+
+    rows = 0
+    started = time()
+
+    try:
+        for row in queryset.values_list(*names).iterator():
+            writer.write(row)
+            rows += 1
+
+            if progress is not None and not rows % batch_size:
+                progress(rows, time() - started)
+    finally:
+        writer.close()
+
+        if is_path and stream is not None:
+            stream.close()
+
+    elapsed = time() - started
+    logger.info("Exported %d %s tickets in %.1fs (%.1f tickets/s)", rows, model._meta.object_name, elapsed, rows / elapsed if elapsed else 0)
+
+    return rows, elapsed
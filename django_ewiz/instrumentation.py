@@ -0,0 +1,81 @@
+"""
+
+.. module:: django-ewiz.instrumentation
+    :synopsis: django-ewiz request instrumentation.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+import logging
+import re
+
+from .signals import ewiz_request
+from .urlbuilders import redact
+
+
+logger = logging.getLogger("django_ewiz")
+
+OPERATION_PATTERN = re.compile(r"/(?P<operation>EW[A-Za-z]+)(?:\?|$)")
+
+
+def get_operation(url):
+    """Returns the REST operation (EWSelect, EWRead, EWCreate, EWUpdate or EWAttach) of a built url."""
+
+    match = OPERATION_PATTERN.search(url)
+    return match.group('operation') if match else None
+
+
+def record(sender, url, duration, response_bytes=0, wire_bytes=0, status_code=None, ticket_count=0, pool_wait=0.0, coalesced=False, error=None, connection=None, **extra):
+    """
+
+    Reports a completed request to the EnterpriseWizard REST interface.
+
+    The request is logged, appended to the connection's query log (so that it shows up in connection.queries when
+    queries are being logged), and sent as the ewiz_request signal with the following arguments:
+
+    * `operation` - EWSelect, EWRead, EWCreate, EWUpdate or EWAttach
+    * `url` - the request url with the password stripped
+    * `duration` - the request latency in seconds, including parsing
+    * `response_bytes` - the decompressed size of the response body (0 if the request was coalesced)
+    * `wire_bytes` - the size of the response body as sent by the server, i.e. compressed if compression was negotiated
+    * `status_code` - the HTTP status code of the response, if one was received
+    * `ticket_count` - the number of tickets selected, read or written
+    * `pool_wait` - the seconds spent waiting for a free connection in the NUM_CONNECTIONS pool
+    * `coalesced` - True if the result was shared from an identical in-flight request instead of being requested
+    * `error` - the exception raised by the request, if any
+    * `concurrency_limit` - the adaptive concurrency limit the request was sent under (EWRead with MAX_CONNECTIONS set only)
+    * `host` - the host the request was routed to (EWSelect and EWRead with HOSTS set only)
+    * `revalidated` - True if an expired cached ticket was found unchanged instead of being read again (EWRead with TICKET_CACHE_TIMEOUT set only)
+    * `cache_hit` - True if a fresh cached ticket was used and no request was sent, in which case the sizes and status code are empty (EWRead with TICKET_CACHE_TIMEOUT set only)
+
+    Any extra keyword arguments are passed through to the signal's receivers.
+
+    """
+
+    url = redact(url)
+    operation = get_operation(url)
+
+    logger.debug("%s %.3fs %d bytes %d tickets%s: %s", operation, duration, response_bytes, ticket_count, " (coalesced)" if coalesced else "", url)
+
+    if connection is not None and getattr(connection, 'queries_logged', False):
+        connection.queries_log.append({
+            'sql': url,
+            'time': "%.3f" % duration,
+        })
+
+    ewiz_request.send(sender=sender, operation=operation, url=url, duration=duration, response_bytes=response_bytes, wire_bytes=wire_bytes, status_code=status_code,
+                      ticket_count=ticket_count, pool_wait=pool_wait, coalesced=coalesced, error=error, **extra)
@@ -0,0 +1,125 @@
+"""
+
+.. module:: django-ewiz.limiter
+    :synopsis: django-ewiz adaptive concurrency limiter.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from threading import Condition, Lock
+from time import time
+import logging
+
+from .registry import PerDatabase
+
+
+logger = logging.getLogger("django_ewiz")
+
+
+class AdaptiveLimiter(object):
+    """
+
+    Limits the number of concurrent requests, adapting the limit to the server's observed latency (AIMD).
+
+    While latency stays within tolerance times its long-term baseline, the limit grows by one per limit's worth of
+    successful requests. When latency rises above that, or a request fails, the limit is multiplied by backoff
+    (at most once per baseline latency, so that a burst of slow responses only counts once). The limit always stays
+    between min_limit and max_limit.
+
+    """
+
+    def __init__(self, min_limit=1, max_limit=16, initial_limit=None, tolerance=2.0, backoff=0.7, smoothing=0.05):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit or min_limit, min_limit), max_limit))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.smoothing = smoothing
+
+        self.condition = Condition(Lock())
+        self.in_flight = 0
+        self.baseline = None
+        self.last_decrease = 0.0
+
+    @property
+    def current_limit(self):
+        return int(self.limit)
+
+    def acquire(self):
+        """Waits for a free slot under the current limit and returns the seconds spent waiting."""
+
+        started = time()
+
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+
+            self.in_flight += 1
+
+        return time() - started
+
+    def release(self, latency, failed=False, sample=True):
+        """
+
+        Frees a slot and adapts the limit to the latency (in seconds) and outcome of the request that held it.
+
+        If sample is False (e.g. the request shared another request's response), the slot is freed without adapting the limit.
+
+        """
+
+        with self.condition:
+            self.in_flight -= 1
+            now = time()
+
+            if not sample:
+                self.condition.notify_all()
+                return
+
+            if failed or (self.baseline is not None and latency > self.baseline * self.tolerance):
+                if now - self.last_decrease > (self.baseline or latency):
+                    self.limit = max(self.limit * self.backoff, self.min_limit)
+                    self.last_decrease = now
+
+                    logger.debug("Concurrency limit decreased to %d (latency %.3fs, baseline %.3fs, failed: %s)", self.limit, latency, self.baseline or 0, failed)
+            else:
+                self.limit = min(self.limit + 1.0 / self.limit, self.max_limit)
+
+            if not failed:
+                self.baseline = latency if self.baseline is None else self.baseline + self.smoothing * (latency - self.baseline)
+
+            self.condition.notify_all()
+
+
+limiters = PerDatabase()
+
+
+def get_limiter(settings_dict):
+    """
+
+    Returns the adaptive limiter shared by every query of the database described by settings_dict,
+    or None if MAX_CONNECTIONS isn't set.
+
+    """
+
+    max_limit = settings_dict.get('MAX_CONNECTIONS')
+
+    if not max_limit:
+        return None
+
+    min_limit = int(settings_dict.get('MIN_CONNECTIONS') or 1)
+
+    return limiters.get(settings_dict, lambda: AdaptiveLimiter(min_limit, int(max_limit), int(settings_dict.get('NUM_CONNECTIONS') or min_limit)))
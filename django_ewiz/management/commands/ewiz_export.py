@@ -0,0 +1,61 @@
+"""
+
+.. module:: django-ewiz.management.commands.ewiz_export
+    :synopsis: Streams an EnterpriseWizard table into an NDJSON, CSV or Parquet file.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.apps import apps
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from ...export import FORMATS, export_tickets
+
+
+class Command(BaseCommand):
+    help = "Streams the tickets of an EnterpriseWizard model into an NDJSON, CSV or Parquet file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help="The model to export, as app_label.ModelName.")
+        parser.add_argument('output', help="The file to export to, or '-' for standard output (NDJSON and CSV only).")
+        parser.add_argument('--format', dest='export_format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--fields', help="A comma separated list of the fields to export. Default: every field.")
+        parser.add_argument('--after-id', help="Only export tickets whose primary key is greater than this.")
+        parser.add_argument('--resume', action='store_true', help="Continue a previous NDJSON or CSV export after its last exported ticket.")
+        parser.add_argument('--database', default=None, help="The database alias to export from.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="The number of tickets between progress reports and in each Parquet row group.")
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as message:
+            raise CommandError(str(message))
+
+        output = self.stdout if options['output'] == '-' else options['output']
+        fields = [field.strip() for field in options['fields'].split(',')] if options['fields'] else None
+
+        def progress(rows, seconds):
+            self.stderr.write("%d tickets exported (%.1f tickets/s)" % (rows, rows / seconds if seconds else 0))
+
+        try:
+            rows, seconds = export_tickets(model, output, export_format=options['export_format'], fields=fields, after_id=options['after_id'],
+                                           resume=options['resume'], using=options['database'], batch_size=options['batch_size'], progress=progress)
+        except ImproperlyConfigured as message:
+            raise CommandError(str(message))
+
+        self.stderr.write("Exported %d tickets in %.1fs (%.1f tickets/s)" % (rows, seconds, rows / seconds if seconds else 0))
@@ -0,0 +1,71 @@
+"""
+
+.. module:: django-ewiz.management.commands.ewiz_mirror
+    :synopsis: Reconciles the local mirrors of EnterpriseWizard tables.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from time import sleep
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...mirror import get_label, get_mirrors
+
+
+class Command(BaseCommand):
+    help = "Brings the local mirrors of EnterpriseWizard tables (see MIRROR_DATABASE) up to date."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help="The ewiz database alias whose mirror to reconcile. Default: every mirrored database.")
+        parser.add_argument('--create', action='store_true', help="Create the mirror's tables first, if they don't exist.")
+        parser.add_argument('--loop', action='store_true', help="Keep reconciling every MIRROR_INTERVAL seconds (or --interval) until interrupted, logging errors instead of stopping.")
+        parser.add_argument('--interval', type=float, default=None, help="The seconds between reconciliations with --loop. Default: the smallest MIRROR_INTERVAL.")
+
+    def handle(self, *args, **options):
+        mirrors = get_mirrors()
+
+        if options['database']:
+            if options['database'] not in mirrors:
+                raise CommandError("The database %r has no MIRROR_DATABASE." % options['database'])
+
+            mirrors = {options['database']: mirrors[options['database']]}
+
+        if options['create']:
+            for mirror in mirrors.values():
+                mirror.create_tables()
+
+        if options['loop']:
+            interval = options['interval'] or min([float(mirror.interval) for mirror in mirrors.values() if mirror.interval] or [0])
+
+            if not interval:
+                raise CommandError("--loop needs --interval or MIRROR_INTERVAL.")
+
+            while True:
+                for mirror in mirrors.values():
+                    mirror.reconcile_all()
+
+                sleep(interval)
+
+        for alias, mirror in mirrors.items():
+            for model in mirror.models:
+                result = mirror.reconcile(model)
+
+                if result is None:
+                    self.stderr.write("%s (%s -> %s): skipped, another reconciliation of it is running" % (get_label(model), alias, mirror.mirror_alias))
+                else:
+                    self.stderr.write("%s (%s -> %s): %d tickets copied, %d deleted" % ((get_label(model), alias, mirror.mirror_alias) + result))
@@ -0,0 +1,73 @@
+"""
+
+.. module:: django-ewiz.metadata
+    :synopsis: django-ewiz per-model metadata registry.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+import logging
+
+
+logging.getLogger("django_ewiz")
+
+
+class ModelMetadata(object):
+    """
+
+    The ewiz facts about a model, computed once.
+
+    * `table` - the model's EnterpriseWizard table
+    * `file_column` - the column of the model's file (help_text='file') field, or None
+    * `write_columns` - the (column, value prefix) pair of each editable field, by field name; the prefix is the related field marker, if any
+    * `blank_fields` - the names of the editable fields that may be sent blank
+
+    """
+
+    def __init__(self, model):
+        opts = model._meta
+
+        self.model = model
+        self.table = opts.db_table
+        self.file_column = None
+        self.write_columns = {}
+        self.blank_fields = set()
+
+        for field in opts.fields:
+            if field.help_text == 'file':
+                self.file_column = field.column
+
+            if field.editable:
+                self.write_columns[field.name] = (field.column, field.help_text)
+
+                if field.blank:
+                    self.blank_fields.add(field.name)
+
+
+registry = {}
+
+
+def get_metadata(model):
+    """Returns the ModelMetadata of a model (or of a model instance's class), building it on first use."""
+
+    if not isinstance(model, type):
+        model = type(model)
+
+    try:
+        return registry[model]
+    except KeyError:
+        return registry.setdefault(model, ModelMetadata(model))
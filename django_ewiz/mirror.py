@@ -0,0 +1,380 @@
+"""
+
+.. module:: django-ewiz.mirror
+    :synopsis: django-ewiz local mirror of EnterpriseWizard tables.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from time import time
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max
+from django.db.models.signals import post_save
+from django.db.utils import DatabaseError, IntegrityError
+
+
+logger = logging.getLogger("django_ewiz")
+
+# The table in the mirror database that records when each mirrored model was last reconciled
+STATE_TABLE = 'django_ewiz_mirror'
+
+MIRROR_MAX_STALENESS = 300
+MIRROR_BATCH_SIZE = 500
+
+# The seconds the reconciliation times read from the mirror database are trusted for
+STATE_CACHE_TIMEOUT = 5
+
+# The seconds a reconciliation's claim on a model lasts unless it is renewed (which it is after every batch)
+LEASE_TIMEOUT = 600
+
+
+def get_label(model):
+    return model._meta.app_label + '.' + model._meta.object_name
+
+
+class Mirror(object):
+    """
+
+    A shadow of some of an ewiz database's tables, kept in another (local) Django database.
+
+    The mirror is brought up to date by reconcile(), which walks each table in ranges of MIRROR_BATCH_SIZE ids,
+    deleting the rows of tickets that no longer exist and copying new tickets from EnterpriseWizard. Existing rows are
+    refreshed as well: all of them, or only those whose modified field (if one is given for the model) is at least
+    the latest value already mirrored. Saves made through the ewiz database are copied into the mirror right away.
+
+    A reconciliation first claims the model by setting a lease on its state row, so that only one process reconciles
+    a model at a time (e.g. of overlapping runs of ewiz_mirror). The others skip it. Each batch is committed on its own,
+    so the mirror database is never locked for longer than one batch takes to write.
+
+    """
+
+    def __init__(self, alias, settings_dict):
+        self.alias = alias
+        self.mirror_alias = settings_dict['MIRROR_DATABASE']
+        self.max_staleness = float(settings_dict.get('MIRROR_MAX_STALENESS') or MIRROR_MAX_STALENESS)
+        self.interval = settings_dict.get('MIRROR_INTERVAL')
+        self.batch_size = int(settings_dict.get('MIRROR_BATCH_SIZE') or MIRROR_BATCH_SIZE)
+
+        # The modified field (or None) of each mirrored model
+        self.models = OrderedDict()
+
+        for entry in settings_dict.get('MIRROR_MODELS') or ():
+            label, modified_field = tuple(entry) if isinstance(entry, (list, tuple)) else (entry, None)
+            self.models[apps.get_model(label)] = modified_field
+
+        # The (reconciled_at, checked_at) times of each mirrored model
+        self.reconciled = {}
+        self.lock = Lock()
+
+        for model in self.models:
+            post_save.connect(self.copy_saved, sender=model, dispatch_uid=(STATE_TABLE, self.alias, get_label(model)))
+
+    def create_tables(self):
+        """Creates the tables of the mirrored models and the mirror's state table in the mirror database, if they don't exist."""
+
+        connection = connections[self.mirror_alias]
+        existing = set(connection.introspection.table_names())
+        state_columns = []
+
+        if STATE_TABLE in existing:
+            with connection.cursor() as cursor:
+                state_columns = [column.name for column in connection.introspection.get_table_description(cursor, STATE_TABLE)]
+
+        with connection.schema_editor() as editor:
+            for model in self.models:
+                if model._meta.db_table not in existing:
+                    editor.create_model(model)
+
+            if STATE_TABLE not in existing:
+                editor.execute("CREATE TABLE %s (label varchar(255) PRIMARY KEY, reconciled_at double precision NOT NULL, locked_until double precision)"
+                               % editor.quote_name(STATE_TABLE))
+            elif 'locked_until' not in state_columns:
+                # State tables created before reconciliations took leases
+                editor.execute("ALTER TABLE %s ADD COLUMN locked_until double precision" % editor.quote_name(STATE_TABLE))
+
+    def is_fresh(self, model):
+        """Returns True if model was reconciled within MIRROR_MAX_STALENESS seconds."""
+
+        label = get_label(model)
+        now = time()
+
+        with self.lock:
+            reconciled_at, checked_at = self.reconciled.get(label, (None, 0))
+
+        # Another process may have reconciled the model since we last looked
+        if now - checked_at > STATE_CACHE_TIMEOUT:
+            reconciled_at = self.read_state(label)
+
+            with self.lock:
+                self.reconciled[label] = (reconciled_at, now)
+
+        return reconciled_at is not None and now - reconciled_at <= self.max_staleness
+
+    def read_state(self, label):
+        connection = connections[self.mirror_alias]
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reconciled_at FROM %s WHERE label = %%s" % connection.ops.quote_name(STATE_TABLE), [label])
+                row = cursor.fetchone()
+        except DatabaseError:
+            logger.warning("The mirror database %r has no state table; run 'manage.py ewiz_mirror --create'.", self.mirror_alias)
+            return None
+
+        return row[0] if row else None
+
+    def write_state(self, label, reconciled_at, lease):
+        """Records that label was reconciled at reconciled_at and releases the lease of the reconciliation."""
+
+        connection = connections[self.mirror_alias]
+
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE %s SET reconciled_at = %%s, locked_until = NULL WHERE label = %%s AND locked_until = %%s"
+                           % connection.ops.quote_name(STATE_TABLE), [reconciled_at, label, lease])
+
+            if not cursor.rowcount:
+                raise DatabaseError("The reconciliation of %s lost its lease." % label)
+
+        with self.lock:
+            self.reconciled[label] = (reconciled_at, time())
+
+    def claim(self, label):
+        """
+
+        Claims the reconciliation of label for LEASE_TIMEOUT seconds, creating its state row if needed.
+
+        :returns: The lease (the time the claim expires at), or None if another process holds an unexpired claim.
+
+        """
+
+        connection = connections[self.mirror_alias]
+        table = connection.ops.quote_name(STATE_TABLE)
+        now = time()
+        lease = now + LEASE_TIMEOUT
+
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE %s SET locked_until = %%s WHERE label = %%s AND (locked_until IS NULL OR locked_until < %%s)" % table, [lease, label, now])
+
+            if cursor.rowcount:
+                return lease
+
+            cursor.execute("SELECT 1 FROM %s WHERE label = %%s" % table, [label])
+
+            if cursor.fetchone():
+                return None
+
+            # A model that was never reconciled gets a row that doesn't count as fresh
+            try:
+                with transaction.atomic(using=self.mirror_alias):
+                    cursor.execute("INSERT INTO %s (label, reconciled_at, locked_until) VALUES (%%s, 0, %%s)" % table, [label, lease])
+            except IntegrityError:
+                # Another process created the row (and claimed it) first
+                return None
+
+        return lease
+
+    def renew(self, label, lease):
+        """
+
+        Extends a claim made by claim() by LEASE_TIMEOUT seconds from now.
+
+        :returns: The new lease.
+        :raises: DatabaseError if the claim expired and was taken over by another process.
+
+        """
+
+        connection = connections[self.mirror_alias]
+        renewed = time() + LEASE_TIMEOUT
+
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE %s SET locked_until = %%s WHERE label = %%s AND locked_until = %%s" % connection.ops.quote_name(STATE_TABLE), [renewed, label, lease])
+
+            if not cursor.rowcount:
+                raise DatabaseError("The reconciliation of %s lost its lease." % label)
+
+        return renewed
+
+    def release(self, label, lease):
+        connection = connections[self.mirror_alias]
+
+        with connection.cursor() as cursor:
+            cursor.execute("UPDATE %s SET locked_until = NULL WHERE label = %%s AND locked_until = %%s" % connection.ops.quote_name(STATE_TABLE), [label, lease])
+
+    def reconcile(self, model):
+        """
+
+        Brings the mirror of model up to date with EnterpriseWizard, unless another process is already doing so.
+
+        :returns: The (copied, deleted) numbers of tickets, or None if the model was skipped.
+
+        """
+
+        label = get_label(model)
+        lease = self.claim(label)
+
+        if lease is None:
+            logger.info("Skipped reconciling the mirror of %s; another reconciliation of it is running.", label)
+            return None
+
+        try:
+            return self.reconcile_claimed(model, lease)
+        except Exception:
+            self.release(label, lease)
+            raise
+
+    def reconcile_claimed(self, model, lease):
+        started = time()
+        modified_field = self.models[model]
+        source = model._base_manager.using(self.alias)
+        target = model._base_manager.using(self.mirror_alias)
+
+        # Listing the ids of a table is a single select (no tickets are read)
+        to_python = model._meta.pk.to_python
+        source_ids = sorted(set(to_python(pk) for pk in source.values_list('pk', flat=True)))
+
+        # Without a modified field, every mirrored ticket is refreshed
+        changed_ids = None
+        if modified_field:
+            high_water = target.aggregate(high_water=Max(modified_field))['high_water']
+            if high_water is not None:
+                changed_ids = set(to_python(pk) for pk in source.filter(**{modified_field + '__gte': high_water}).values_list('pk', flat=True))
+
+        copied = deleted = 0
+
+        if not source_ids:
+            deleted = target.count()
+            target.all().delete()
+
+        for start in range(0, len(source_ids), self.batch_size):
+            batch = source_ids[start:start + self.batch_size]
+
+            # Each range runs up to the next batch's first id and the first and last ranges are open ended,
+            # so that every mirrored row is checked, including those of tickets outside of the table's current ids
+            mirrored = target.all()
+            if start:
+                mirrored = mirrored.filter(pk__gte=batch[0])
+            if start + self.batch_size < len(source_ids):
+                mirrored = mirrored.filter(pk__lt=source_ids[start + self.batch_size])
+
+            mirrored_ids = set(to_python(pk) for pk in mirrored.values_list('pk', flat=True))
+            wanted_ids = set(batch)
+
+            stale_ids = mirrored_ids - wanted_ids
+            refresh_ids = mirrored_ids & wanted_ids
+            if changed_ids is not None:
+                refresh_ids &= changed_ids
+
+            copy_ids = (wanted_ids - mirrored_ids) | refresh_ids
+            tickets = list(source.filter(pk__in=sorted(copy_ids))) if copy_ids else []
+
+            with transaction.atomic(using=self.mirror_alias):
+                if stale_ids or refresh_ids:
+                    target.filter(pk__in=stale_ids | refresh_ids).delete()
+
+                target.bulk_create(tickets)
+
+            copied += len(tickets)
+            deleted += len(stale_ids)
+
+            lease = self.renew(get_label(model), lease)
+
+        self.write_state(get_label(model), started, lease)
+
+        logger.info("Reconciled the mirror of %s in %.1fs: %d tickets copied, %d deleted.", get_label(model), time() - started, copied, deleted)
+
+        return copied, deleted
+
+    def reconcile_all(self):
+        """Reconciles every mirrored model, logging (rather than raising) the errors of each."""
+
+        for model in self.models:
+            try:
+                self.reconcile(model)
+            except Exception:
+                logger.exception("Reconciling the mirror of %s failed.", get_label(model))
+
+    def copy_saved(self, sender, instance, using, raw=False, **kwargs):
+        """Copies a ticket saved through the ewiz database into the mirror, so that the save can be read back."""
+
+        if raw or using != self.alias:
+            return
+
+        values = dict((field.attname, getattr(instance, field.attname)) for field in sender._meta.concrete_fields if not field.primary_key)
+
+        try:
+            sender._base_manager.using(self.mirror_alias).update_or_create(pk=instance.pk, defaults=values)
+        except DatabaseError:
+            logger.exception("Copying %s %s into the mirror failed; it will be copied on the next reconciliation.", get_label(sender), instance.pk)
+
+
+mirrors = None
+mirrors_lock = Lock()
+
+
+def get_mirrors():
+    """Returns the Mirror of every ewiz database with a MIRROR_DATABASE, by the ewiz database's alias."""
+
+    global mirrors
+
+    with mirrors_lock:
+        if mirrors is None:
+            mirrors = OrderedDict((alias, Mirror(alias, settings_dict)) for alias, settings_dict in settings.DATABASES.items()
+                                  if settings_dict.get('ENGINE') == 'django_ewiz' and settings_dict.get('MIRROR_DATABASE'))
+
+        return mirrors
+
+
+def get_model_mirror(model):
+    """Returns the Mirror that model is mirrored by, or None."""
+
+    for mirror in get_mirrors().values():
+        if model in mirror.models:
+            return mirror
+
+    return None
+
+
+class MirrorRouter(object):
+    """
+
+    Routes the models mirrored by an ewiz database's MIRROR_DATABASE.
+
+    Reads go to the mirror while the model was reconciled within MIRROR_MAX_STALENESS seconds and to the ewiz
+    database otherwise. Writes always go to the ewiz database (and are copied into the mirror). Reads that must see
+    EnterpriseWizard as it is right now can bypass the mirror with .using(). The router never reconciles the mirror
+    itself; that is left to the ewiz_mirror command.
+
+    """
+
+    def db_for_read(self, model, **hints):
+        mirror = get_model_mirror(model)
+
+        if mirror is None:
+            return None
+
+        return mirror.mirror_alias if mirror.is_fresh(model) else mirror.alias
+
+    def db_for_write(self, model, **hints):
+        mirror = get_model_mirror(model)
+
+        return mirror.alias if mirror is not None else None
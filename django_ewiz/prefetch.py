@@ -0,0 +1,124 @@
+"""
+
+.. module:: django-ewiz.prefetch
+    :synopsis: django-ewiz speculative page prefetching.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from time import time
+import logging
+
+from .registry import PerDatabase
+
+
+logger = logging.getLogger("django_ewiz")
+
+PREFETCH_TIMEOUT = 30  # Default seconds an unclaimed prefetched page is kept
+PREFETCH_MAX_PAGE_SIZE = 500  # Default maximum number of tickets in a prefetched page
+TRACKED_QUERIES = 1000  # The number of queries whose last fetched page is remembered
+
+
+class PagePrefetcher(object):
+    """
+
+    Fetches pages in the background ahead of them being requested.
+
+    No more than budget pages are being fetched or held at once. Pages that aren't claimed within timeout
+    seconds are dropped. The end of the last page fetched of each query is remembered (see advance), so that only
+    queries being paged through sequentially are prefetched.
+
+    """
+
+    def __init__(self, budget=1, timeout=PREFETCH_TIMEOUT):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.budget = budget
+        self.timeout = timeout
+        self.lock = Lock()
+        self.pages = OrderedDict()
+        self.page_ends = OrderedDict()
+        self.executor = ThreadPoolExecutor(budget)
+
+    def advance(self, query, low_mark, high_mark):
+        """
+
+        Notes that the page [low_mark:high_mark] of the query identified by query was fetched.
+
+        :returns: True if the page starts where the last page fetched of the same query ended.
+
+        """
+
+        with self.lock:
+            previous_end = self.page_ends.pop(query, None)
+            self.page_ends[query] = high_mark
+
+            while len(self.page_ends) > TRACKED_QUERIES:
+                self.page_ends.popitem(last=False)
+
+        return previous_end == low_mark
+
+    def prefetch(self, key, func):
+        """Starts fetching the page identified by key by calling func in the background, unless it is already being fetched or the budget is spent."""
+
+        with self.lock:
+            self.expire()
+
+            if key in self.pages or len(self.pages) >= self.budget:
+                return
+
+            self.pages[key] = (self.executor.submit(func), time())
+
+    def take(self, key):
+        """Claims the page identified by key, returning its result (waiting for it if necessary) or None if it wasn't prefetched or failed."""
+
+        with self.lock:
+            self.expire()
+            future, created = self.pages.pop(key, (None, None))
+
+        if future is None:
+            return None
+
+        try:
+            return future.result()
+        except Exception:
+            logger.debug("A prefetched page failed, fetching it again.", exc_info=True)
+            return None
+
+    def expire(self):
+        now = time()
+
+        for key, (future, created) in list(self.pages.items()):
+            if now - created > self.timeout:
+                future.cancel()
+                del self.pages[key]
+
+
+prefetchers = PerDatabase()
+
+
+def get_prefetcher(settings_dict):
+    """Returns the page prefetcher of the database described by settings_dict, or None if PREFETCH_PAGES isn't set."""
+
+    budget = settings_dict.get('PREFETCH_PAGES')
+
+    if not budget:
+        return None
+
+    return prefetchers.get(settings_dict, lambda: PagePrefetcher(int(budget), float(settings_dict.get('PREFETCH_TIMEOUT') or PREFETCH_TIMEOUT)))
@@ -0,0 +1,62 @@
+"""
+
+.. module:: django-ewiz.registry
+    :synopsis: django-ewiz per-database registries.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from threading import Lock
+
+
+def get_key(settings_dict):
+    """Returns the key that identifies the database described by settings_dict across connections and threads."""
+
+    return (settings_dict["HOST"], settings_dict["NAME"], settings_dict["USER"])
+
+
+class PerDatabase(object):
+    """
+
+    Holds one object per database (e.g. its limiter or its write queue), shared by every connection and thread.
+
+    Each object is created by the factory passed to get() the first time it is asked for.
+
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.lock = Lock()
+
+    def get(self, settings_dict, factory):
+        key = get_key(settings_dict)
+
+        with self.lock:
+            instance = self.objects.get(key)
+
+            if instance is None:
+                instance = self.objects[key] = factory()
+
+            return instance
+
+    def values(self):
+        with self.lock:
+            return list(self.objects.values())
+
+    def clear(self):
+        with self.lock:
+            self.objects.clear()
@@ -0,0 +1,156 @@
+"""
+
+.. module:: django-ewiz.related
+    :synopsis: django-ewiz batched related field resolution.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+import logging
+
+from django.db.models import Manager
+from django.db.models.query import QuerySet
+
+
+logging.getLogger("django_ewiz")
+
+
+class Related(object):
+    """
+
+    Describes a related (help_text=':') field to resolve in batch.
+
+    :param field_name: The name of the related field on the queried model.
+    :param model: The model of the related EnterpriseWizard table.
+    :param to_field: The name of the field of the related model the related field's value refers to. Default: the primary key.
+    :param to_attr: The attribute each related instance (or None) is stored in. Default: field_name + '_object'.
+
+    """
+
+    def __init__(self, field_name, model, to_field=None, to_attr=None):
+        self.field_name = field_name
+        self.model = model
+        self.to_field = to_field or model._meta.pk.name
+        self.to_attr = to_attr or field_name + '_object'
+
+
+def prefetch_related_tickets(instances, *lookups, **kwargs):
+    """
+
+    Resolves the related fields described by lookups (Related instances) for a whole page of instances.
+
+    All values referring to the same related table and field are collected and requested with a single __in select
+    (which is split into concurrent chunks if it is larger than IN_CHUNK_SIZE). Each related ticket is read once, no
+    matter how many instances refer to it, and the results are joined to the instances in memory.
+
+    :param using: The database alias to request the related tickets from. Default: the instances' database.
+    :returns: The instances, as a list.
+
+    """
+
+    instances = list(instances)
+
+    if not instances or not lookups:
+        return instances
+
+    using = kwargs.get('using') or instances[0]._state.db
+
+    # Group the lookups by related table and field so that each is only requested once
+    groups = {}
+    for lookup in lookups:
+        attname = instances[0]._meta.get_field(lookup.field_name).attname
+        groups.setdefault((lookup.model, lookup.to_field), []).append((attname, lookup.to_attr))
+
+    for (model, to_field), targets in groups.items():
+        values = []
+        seen = set()
+
+        for instance in instances:
+            for attname, to_attr in targets:
+                value = getattr(instance, attname)
+                if value not in (None, '') and str(value) not in seen:
+                    seen.add(str(value))
+                    values.append(value)
+
+        related = {}
+        if values:
+            manager = model._default_manager.db_manager(using) if using else model._default_manager
+
+            for related_instance in manager.filter(**{to_field + '__in': values}):
+                related[str(getattr(related_instance, to_field))] = related_instance
+
+        for instance in instances:
+            for attname, to_attr in targets:
+                value = getattr(instance, attname)
+                setattr(instance, to_attr, related.get(str(value)) if value not in (None, '') else None)
+
+    return instances
+
+
+class EwizQuerySet(QuerySet):
+    """A QuerySet that can resolve related (help_text=':') fields in batch once it is evaluated."""
+
+    def __init__(self, *args, **kwargs):
+        super(EwizQuerySet, self).__init__(*args, **kwargs)
+        self._ewiz_related_lookups = []
+        self._ewiz_related_done = False
+
+    def prefetch_tickets(self, *lookups):
+        """
+
+        Returns a new QuerySet that, once evaluated, resolves each of the given Related lookups with one batched
+        select per related table. Passing None clears the lookups.
+
+        """
+
+        clone = self._clone()
+
+        if lookups == (None,):
+            clone._ewiz_related_lookups = []
+        else:
+            clone._ewiz_related_lookups = clone._ewiz_related_lookups + list(lookups)
+
+        return clone
+
+    def _clone(self, *args, **kwargs):
+        clone = super(EwizQuerySet, self)._clone(*args, **kwargs)
+        clone._ewiz_related_lookups = self._ewiz_related_lookups[:]
+
+        return clone
+
+    def _fetch_all(self):
+        super(EwizQuerySet, self)._fetch_all()
+
+        if self._ewiz_related_lookups and not self._ewiz_related_done:
+            # values() and values_list() querysets don't yield model instances
+            if self._result_cache and hasattr(self._result_cache[0], '_meta'):
+                prefetch_related_tickets(self._result_cache, *self._ewiz_related_lookups, using=self.db)
+
+            self._ewiz_related_done = True
+
+
+class EwizManager(Manager):
+    """A Manager that provides EwizQuerySets."""
+
+    def get_queryset(self):
+        return EwizQuerySet(self.model, using=self._db)
+
+    # Django < 1.6
+    get_query_set = get_queryset
+
+    def prefetch_tickets(self, *lookups):
+        return self.get_queryset().prefetch_tickets(*lookups)
@@ -0,0 +1,27 @@
+"""
+
+.. module:: django-ewiz.signals
+    :synopsis: django-ewiz database backend signals.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.dispatch import Signal
+
+
+# Sent after every request to the EnterpriseWizard REST interface (see django_ewiz.instrumentation.record for the arguments).
+ewiz_request = Signal()
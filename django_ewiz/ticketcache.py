@@ -0,0 +1,129 @@
+"""
+
+.. module:: django-ewiz.ticketcache
+    :synopsis: django-ewiz cache of parsed tickets and their validators.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from time import time
+import logging
+
+from .registry import PerDatabase
+
+
+logger = logging.getLogger("django_ewiz")
+
+TICKET_CACHE_SIZE = 10000
+
+
+class CachedTicket(object):
+    """
+
+    A parsed ticket along with what is needed to check whether it changed since it was read:
+    the response's ETag and Last-Modified headers, and the ticket's modification time (its MODIFIED_COLUMN value).
+
+    """
+
+    def __init__(self, ticket, expires, etag=None, last_modified=None, modified=None):
+        self.ticket = ticket
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+        self.modified = modified
+
+    def is_fresh(self):
+        return time() < self.expires
+
+    def conditional_headers(self):
+        """Returns the headers that make a read conditional on the ticket having changed, if the server sent validators."""
+
+        headers = {}
+
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        return headers
+
+
+class TicketCache(object):
+    """
+
+    A least recently used cache of up to size parsed tickets, each trusted for timeout seconds.
+
+    Expired tickets are kept (until evicted) so that they can be revalidated instead of read again.
+
+    """
+
+    def __init__(self, timeout, size=TICKET_CACHE_SIZE):
+        self.timeout = timeout
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        """Returns the CachedTicket of key, expired or not, or None."""
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is not None:
+                # Mark the ticket as most recently used
+                del self.entries[key]
+                self.entries[key] = entry
+
+            return entry
+
+    def set(self, key, ticket, **validators):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = CachedTicket(ticket, time() + self.timeout, **validators)
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def refresh(self, entry):
+        """Trusts a revalidated ticket for another timeout seconds."""
+
+        entry.expires = time() + self.timeout
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+caches = PerDatabase()
+
+
+def get_ticket_cache(settings_dict):
+    """
+
+    Returns the ticket cache shared by every query of the database described by settings_dict,
+    or None if TICKET_CACHE_TIMEOUT isn't set.
+
+    """
+
+    timeout = settings_dict.get('TICKET_CACHE_TIMEOUT')
+
+    if not timeout:
+        return None
+
+    return caches.get(settings_dict, lambda: TicketCache(float(timeout), int(settings_dict.get('TICKET_CACHE_SIZE') or TICKET_CACHE_SIZE)))
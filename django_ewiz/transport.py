@@ -0,0 +1,110 @@
+"""
+
+.. module:: django-ewiz.transport
+    :synopsis: django-ewiz pooled HTTP sessions and write transport.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+import logging
+
+from .registry import PerDatabase, get_key
+
+
+logger = logging.getLogger("django_ewiz")
+
+ACCEPT_ENCODING = 'gzip, deflate'
+
+# The smallest number of kept-alive connections a session pools
+POOL_SIZE = 10
+
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded; charset=utf-8'
+
+# Statuses with which a server refuses a POST it doesn't support (nothing is written)
+POST_REFUSED_STATUS_CODES = (405, 415, 501)
+
+sessions = PerDatabase()
+
+# The databases whose servers refused a POST write
+get_only = set()
+
+
+def request_headers(settings_dict, headers=None):
+    """Returns the headers to send with a request, negotiating compression according to the ACCEPT_ENCODING setting."""
+
+    headers = dict(headers or {})
+    headers['Accept-Encoding'] = settings_dict.get('ACCEPT_ENCODING') or ACCEPT_ENCODING
+
+    return headers
+
+
+def get_session(settings_dict):
+    """
+
+    Returns the requests session shared by every request to the database described by settings_dict.
+
+    The session keeps its connections alive, pooling as many per host as the database's settings allow to be in use at once.
+
+    """
+
+    return sessions.get(settings_dict, lambda: create_session(settings_dict))
+
+
+def create_session(settings_dict):
+    import requests
+
+    pool_size = max([POOL_SIZE] + [int(settings_dict.get(name) or 0) for name in ('NUM_CONNECTIONS', 'MAX_CONNECTIONS', 'WRITE_BEHIND_CONNECTIONS')])
+
+    # Keep a separate pool of pool_size connections for the primary host and each of the HOSTS
+    adapter = requests.adapters.HTTPAdapter(pool_connections=len(settings_dict.get('HOSTS') or ()) + 1, pool_maxsize=pool_size)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+def send_write(settings_dict, builder):
+    """
+
+    Sends an Insert or Update request.
+
+    With WRITE_TRANSPORT set to 'post', the request's parameters are sent as a form-encoded POST body. If the server
+    refuses the POST, the request (and every later write to the database) is sent as a GET url instead.
+
+    :param settings_dict: The database's settings.
+    :type settings_dict: dict
+    :param builder: The Insert or Update url builder of the request.
+    :returns: The (url, response) pair of the request; the url of a POST carries no parameters.
+
+    """
+
+    session = get_session(settings_dict)
+
+    if (settings_dict.get('WRITE_TRANSPORT') or 'get').lower() == 'post' and get_key(settings_dict) not in get_only:
+        url, body = builder.build_form()
+        response = session.post(url, data=body, headers=request_headers(settings_dict, {'Content-Type': FORM_CONTENT_TYPE}))
+
+        if response.status_code not in POST_REFUSED_STATUS_CODES:
+            return url, response
+
+        logger.warning("%s refused a POST write (HTTP %d); falling back to GET writes.", url, response.status_code)
+        get_only.add(get_key(settings_dict))
+
+    url = builder.build()
+    return url, session.get(url, headers=request_headers(settings_dict))
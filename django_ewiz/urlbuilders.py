@@ -22,20 +22,37 @@
 
 from functools import wraps
 import logging
+import re
 import sys
 
 from django.db.utils import DatabaseError
 
+from .metadata import get_metadata
+
 
 # Python 2 compatibility
 try:
-    from urllib import quote
+    from urllib import quote, quote_plus
 except ImportError:
-    from urllib.parse import quote
+    from urllib.parse import quote, quote_plus
 
 
 logger = logging.getLogger("django_ewiz_urls")
 
+PASSWORD_PATTERN = re.compile(r"([?&]\$password=)[^&]*")
+
+
+def redact(url):
+    """Strips the password from a built url so that it can be safely used as a key or logged."""
+
+    return PASSWORD_PATTERN.sub(r"\1", url)
+
+
+def encode_form(params):
+    """Form-encodes a list of (key, value) pairs into a request body in a single pass."""
+
+    return '&'.join(quote_plus(key, '$') + '=' + quote_plus(value) for key, value in params).encode('utf-8')
+
 
 def safe_call(func):
     """Function wrapper for debugging - taken from Django-Nonrel/djangotoolbox."""
@@ -76,7 +93,7 @@ class Read(object):
     @safe_call
     def build(self):
         url = quote(self.protocol + self.host + 'EWRead?$KB=' + self.knowledge_base + '&$table=' + self.table + '&$login=' + self.login + '&$password=' + self.password + '&$lang=' + self.language + '&id=' + str(self.ticket_id), ":/?$&='")
-        logger.debug(url)
+        logger.debug(redact(url))
 
         return url
 
@@ -107,7 +124,7 @@ class Select(object):
     @safe_call
     def build(self):
         url = quote(self.__build_select() + self.__build_where(), ":/?$&='")
-        logger.debug(url)
+        logger.debug(redact(url))
 
         return url
 
@@ -146,7 +163,7 @@ class Insert(object):
 
     """
 
-    def __init__(self, settings_dict, table, data):
+    def __init__(self, settings_dict, table, data, metadata=None):
         if settings_dict["PORT"] == "443":
             self.protocol = 'https://'
         else:
@@ -159,27 +176,37 @@ class Insert(object):
         self.language = 'en'
         self.table = table
         self.data = data
+        self.metadata = metadata or (get_metadata(data[0][0].model) if data else None)
 
     @safe_call
     def build(self):
-        url = quote(self.__build_insert() + self.__build_data() + '&time_spent=0:0:1:0', ":/?$&='")
-        logger.debug(url)
+        url = quote(self.protocol + self.host + 'EWCreate?' + '&'.join(key + '=' + value for key, value in self.__build_params()), ":/?$&='")
+        logger.debug(redact(url))
 
         return url
 
     @safe_call
-    def __build_insert(self):
-        return self.protocol + self.host + 'EWCreate?$KB=' + self.knowledge_base + '&$table=' + self.table + '&$login=' + self.login + '&$password=' + self.password + '&$lang=' + self.language
+    def build_form(self):
+        """Returns the bare EWCreate url and the form-encoded body that carries the request's parameters."""
+
+        url = self.protocol + self.host + 'EWCreate'
+        logger.debug(url)
+
+        return url, encode_form(self.__build_params())
+
+    def __build_params(self):
+        params = [('$KB', self.knowledge_base), ('$table', self.table), ('$login', self.login), ('$password', self.password), ('$lang', self.language)]
 
-    @safe_call
-    def __build_data(self):
-        data_string = ''
         for field, value in self.data:
             # Only insert if the field is editable and the field has a value or is allowed to be blank
-            if field.editable and (value or field.blank):
-                data_string += '&' + field.column + '=' + field.help_text + str(value).replace('&', '%26amp%3B')
+            column = self.metadata.write_columns.get(field.name)
+            # '&' is escaped the way the server expects it in either transport
+            if column is not None and (value or field.name in self.metadata.blank_fields):
+                params.append((column[0], column[1] + str(value).replace('&', '%26amp%3B')))
 
-        return data_string
+        params.append(('time_spent', '0:0:1:0'))
+
+        return params
 
 
 class Update(object):
@@ -192,7 +219,7 @@ class Update(object):
 
     """
 
-    def __init__(self, settings_dict, table, ticket_id, data):
+    def __init__(self, settings_dict, table, ticket_id, data, metadata=None):
         if settings_dict["PORT"] == "443":
             self.protocol = 'https://'
         else:
@@ -206,27 +233,37 @@ class Update(object):
         self.table = table
         self.ticket_id = str(ticket_id)
         self.data = data
+        self.metadata = metadata or (get_metadata(data[0][0].model) if data else None)
 
     @safe_call
     def build(self):
-        url = quote(self.__build_update() + self.__build_data() + '&time_spent=0:0:1:0', ":/?$&='")
-        logger.debug(url)
+        url = quote(self.protocol + self.host + 'EWUpdate?' + '&'.join(key + '=' + value for key, value in self.__build_params()), ":/?$&='")
+        logger.debug(redact(url))
 
         return url
 
     @safe_call
-    def __build_update(self):
-        return self.protocol + self.host + 'EWUpdate?$KB=' + self.knowledge_base + '&$table=' + self.table + '&$login=' + self.login + '&$password=' + self.password + '&$lang=' + self.language
+    def build_form(self):
+        """Returns the bare EWUpdate url and the form-encoded body that carries the request's parameters."""
+
+        url = self.protocol + self.host + 'EWUpdate'
+        logger.debug(url)
+
+        return url, encode_form(self.__build_params())
+
+    def __build_params(self):
+        params = [('$KB', self.knowledge_base), ('$table', self.table), ('$login', self.login), ('$password', self.password), ('$lang', self.language), ('id', self.ticket_id)]
 
-    @safe_call
-    def __build_data(self):
-        data_string = '&id=' + self.ticket_id
         for field, value in self.data:
             # Only update if the field is editable and the field has a value or is allowed to be blank
-            if field.editable and (value or field.blank):
-                data_string += '&' + field.column + '=' + field.help_text + str(value).replace('&', '%26amp%3B')
+            column = self.metadata.write_columns.get(field.name)
+            # '&' is escaped the way the server expects it in either transport
+            if column is not None and (value or field.name in self.metadata.blank_fields):
+                params.append((column[0], column[1] + str(value).replace('&', '%26amp%3B')))
+
+        params.append(('time_spent', '0:0:1:0'))
 
-        return data_string
+        return params
 
 
 class Attach(object):
@@ -257,6 +294,6 @@ class Attach(object):
     @safe_call
     def build(self):
         url = quote(self.protocol + self.host + 'EWAttach?$KB=' + self.knowledge_base + '&$table=' + self.table + '&$login=' + self.login + '&$password=' + self.password + '&$lang=' + self.language + '&id=' + str(self.ticket_id) + '&field=' + str(self.field_name) + '&fileName=' + str(self.file_name), ":/?$&='")
-        logger.debug(url)
+        logger.debug(redact(url))
 
         return url
@@ -0,0 +1,228 @@
+"""
+
+.. module:: django-ewiz.writebehind
+    :synopsis: django-ewiz write coalescing queue.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+import atexit
+import logging
+
+from .registry import PerDatabase
+
+
+logger = logging.getLogger("django_ewiz")
+
+WRITE_BEHIND_INTERVAL = 0.5  # Default seconds between background flushes
+
+
+class PendingUpdate(object):
+    """The merged field changes of one ticket and the callable that sends them."""
+
+    def __init__(self):
+        self.values = OrderedDict()
+        self.send = None
+
+    def merge(self, values, send):
+        for field, value in values:
+            self.values[field.column] = (field, value)
+
+        self.send = send
+
+
+class WriteQueue(object):
+    """
+
+    Queues ticket updates, merging the field changes of updates to the same ticket, and sends them in the background.
+
+    Pending updates are sent every interval seconds (or when flush() is called) by up to max_workers threads.
+    Updates to the same ticket are never sent concurrently: changes made while a ticket's update is in flight are
+    sent once it has completed, so each ticket's updates reach the server in order.
+
+    """
+
+    def __init__(self, interval=WRITE_BEHIND_INTERVAL, max_workers=1):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.interval = interval
+        self.lock = Lock()
+        self.pending = OrderedDict()
+        self.in_flight = {}
+        self.errors = []
+        self.executor = ThreadPoolExecutor(max_workers)
+        self.wakeup = Event()
+        self.thread = None
+
+    def enqueue(self, key, values, send):
+        """
+
+        Queues the (field, value) pairs of an update to the ticket identified by key.
+
+        :param send: A callable that sends a list of (field, value) pairs to the server.
+
+        """
+
+        with self.lock:
+            update = self.pending.get(key)
+            if update is None:
+                update = self.pending[key] = PendingUpdate()
+
+            update.merge(values, send)
+
+            if self.thread is None:
+                self.thread = Thread(target=self.run, name="django_ewiz write-behind")
+                self.thread.daemon = True
+                self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+
+            try:
+                self.submit()
+            except RuntimeError:
+                # The executor stops accepting work once the interpreter is shutting down; flush_at_exit() sends the rest
+                return
+
+    def submit(self):
+        """Starts sending every pending update whose ticket doesn't have one in flight."""
+
+        with self.lock:
+            for key in list(self.pending):
+                if key not in self.in_flight:
+                    # Only dequeued once a worker has accepted it, so that a refused update stays pending
+                    self.in_flight[key] = self.executor.submit(self.send, key, self.pending[key])
+                    del self.pending[key]
+
+    def send_pending(self):
+        """Sends every pending update whose ticket doesn't have one in flight in the calling thread."""
+
+        from concurrent.futures import Future
+
+        while True:
+            with self.lock:
+                keys = [key for key in self.pending if key not in self.in_flight]
+
+                if not keys:
+                    return
+
+                future = self.in_flight[keys[0]] = Future()
+                update = self.pending.pop(keys[0])
+
+            try:
+                self.send(keys[0], update)
+            finally:
+                future.set_result(None)
+
+    def send(self, key, update):
+        try:
+            update.send(list(update.values.values()))
+        except Exception as error:
+            logger.exception("A queued update of %s failed.", key)
+
+            with self.lock:
+                self.errors.append(error)
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+
+                # Changes made while this update was in flight can be sent right away
+                if key in self.pending:
+                    self.wakeup.set()
+
+    def wake(self):
+        """Sends the pending updates in the background without waiting for the next interval."""
+
+        self.wakeup.set()
+
+    def flush(self, synchronous=False):
+        """
+
+        Sends every pending update and waits until none are in flight.
+
+        :param synchronous: Send the pending updates in the calling thread instead of the worker threads, which are no
+                            longer available once the interpreter is shutting down.
+        :raises: The first error raised by a queued update since the last flush, if any.
+
+        """
+
+        from concurrent.futures import wait
+
+        while True:
+            if synchronous:
+                self.send_pending()
+            else:
+                self.submit()
+
+            with self.lock:
+                futures = list(self.in_flight.values())
+
+            if not futures:
+                with self.lock:
+                    if not self.pending:
+                        break
+
+                continue
+
+            wait(futures)
+
+        with self.lock:
+            errors, self.errors = self.errors, []
+
+        if errors:
+            raise errors[0]
+
+
+queues = PerDatabase()
+
+
+def get_queue(settings_dict):
+    """Returns the write queue of the database described by settings_dict, creating it on first use."""
+
+    interval = float(settings_dict.get('WRITE_BEHIND_INTERVAL') or WRITE_BEHIND_INTERVAL)
+    max_workers = int(settings_dict.get('WRITE_BEHIND_CONNECTIONS') or settings_dict.get('NUM_CONNECTIONS') or 1)
+
+    return queues.get(settings_dict, lambda: WriteQueue(interval, max_workers))
+
+
+def flush(settings_dict=None):
+    """
+
+    Synchronously sends the queued updates of the database described by settings_dict (default: every database),
+    so that subsequent reads see them.
+
+    """
+
+    if settings_dict is not None:
+        get_queue(settings_dict).flush()
+    else:
+        for queue in queues.values():
+            queue.flush()
+
+
+@atexit.register
+def flush_at_exit():
+    # concurrent.futures shuts the worker threads down before this runs, so the remaining updates are sent from this thread
+    for queue in queues.values():
+        try:
+            queue.flush(synchronous=True)
+        except Exception:
+            logger.exception("Queued updates could not be sent before exiting.")
@@ -15,7 +15,7 @@ setup(
     keywords="django ewiz enterprise wizard srs",
     license='GNU LGPL (http://www.gnu.org/licenses/lgpl.html)',
     url='https://github.com/kavdev/django-ewiz',
-    packages=['django_ewiz'],
+    packages=['django_ewiz', 'django_ewiz.management', 'django_ewiz.management.commands'],
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Environment :: Web Environment",
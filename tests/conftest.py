@@ -0,0 +1,137 @@
+"""
+
+.. module:: django-ewiz.tests.conftest
+    :synopsis: django-ewiz test configuration.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+The tests run the backend against a FakeEwizServer on a local port, serving a freshly generated table to each test.
+
+"""
+
+import os
+import shutil
+import tempfile
+
+import django
+from django.conf import settings
+import pytest
+
+from benchmarks.fakeserver import FakeEwizServer, generate_table
+
+
+TABLE = 'benchmark_ticket'
+TABLE_SIZE = 60
+
+server = FakeEwizServer()
+
+# Holds the SQLite database the 'mirrored' database is mirrored into
+directory = tempfile.mkdtemp()
+
+
+def pytest_configure(config):
+    server.start()
+
+    default = {
+        'ENGINE': 'django_ewiz',
+        'NAME': 'test',
+        'USER': 'test',
+        'PASSWORD': 'secret',
+        'HOST': server.base_url,
+        'PORT': '80',
+        'NUM_CONNECTIONS': 4,
+    }
+
+    settings.configure(
+        DEBUG=False,
+        INSTALLED_APPS=['django_ewiz', 'benchmarks', 'tests'],
+        DATABASES={
+            'default': default,
+            'mirrored': dict(default, MIRROR_DATABASE='mirror', MIRROR_MODELS=['benchmarks.BenchmarkTicket'], MIRROR_BATCH_SIZE=25),
+            'mirror': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(directory, 'mirror.sqlite3'),
+            },
+        },
+    )
+
+    django.setup()
+
+
+def pytest_unconfigure(config):
+    server.stop()
+    shutil.rmtree(directory)
+
+
+@pytest.fixture(autouse=True)
+def table():
+    """Serves a freshly generated table (keyed on ticket id) to each test."""
+
+    server.tables[TABLE] = generate_table(TABLE_SIZE, description_size=20)
+    server.etags = False
+    server.error_rate = 0.0
+
+    yield server.tables[TABLE]
+
+
+@pytest.fixture(autouse=True)
+def registries():
+    """Starts each test without the limiters, queues, caches, sessions and GET-only marks created for earlier tests' settings."""
+
+    from django_ewiz import balancer, limiter, prefetch, ticketcache, transport, writebehind
+
+    registries = [balancer.balancers, limiter.limiters, prefetch.prefetchers, ticketcache.caches, transport.sessions, transport.get_only, writebehind.queues]
+
+    for registry in registries:
+        registry.clear()
+
+    yield
+
+    writebehind.flush()
+
+    for registry in registries:
+        registry.clear()
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """Returns a function that overrides settings of the default database for the duration of the test."""
+
+    from django.db import connection
+
+    def override(**values):
+        for name, value in values.items():
+            monkeypatch.setitem(connection.settings_dict, name, value)
+
+    return override
+
+
+@pytest.fixture
+def requests():
+    """Collects the keyword arguments of every ewiz_request signal sent during the test."""
+
+    from django_ewiz.signals import ewiz_request
+
+    sent = []
+
+    def receiver(sender, **kwargs):
+        sent.append(kwargs)
+
+    ewiz_request.connect(receiver, weak=False)
+
+    yield sent
+
+    ewiz_request.disconnect(receiver)
@@ -0,0 +1,45 @@
+"""
+
+.. module:: django-ewiz.tests.models
+    :synopsis: django-ewiz test models.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.db.models import Model, AutoField, CharField
+
+from benchmarks.models import BenchmarkTicket
+from django_ewiz import EwizManager
+
+
+class Person(Model):
+    person_id = AutoField(primary_key=True, db_column='id')
+    username = CharField(max_length=50)
+    name = CharField(max_length=255)
+
+    class Meta:
+        app_label = 'tests'
+        db_table = 'person'
+        managed = False
+
+
+class Ticket(BenchmarkTicket):
+    objects = EwizManager()
+
+    class Meta:
+        app_label = 'tests'
+        proxy = True
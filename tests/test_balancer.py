@@ -0,0 +1,76 @@
+"""
+
+.. module:: django-ewiz.tests.test_balancer
+    :synopsis: django-ewiz read load balancing tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+import socket
+
+from django.db.utils import DatabaseError
+import pytest
+
+from benchmarks.models import BenchmarkTicket
+from django_ewiz.balancer import Balancer
+
+from .conftest import server
+
+
+@pytest.fixture
+def dead_host():
+    """Returns the HOST setting of a port nothing listens on."""
+
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+    listener.close()
+
+    return '127.0.0.1:%d/ewws/' % port
+
+
+def test_acquire_excludes_a_failed_host():
+    balancer = Balancer('a', [('a', 1), ('b', 1)])
+
+    for attempt in range(20):
+        failed = balancer.acquire()
+        assert balancer.acquire(exclude=failed) is not failed
+
+
+def test_acquire_falls_back_to_the_only_host():
+    balancer = Balancer('a', [('a', 1)])
+    host = balancer.acquire()
+
+    assert balancer.acquire(exclude=host) is host
+
+
+def test_reads_are_retried_on_another_host(database, requests, dead_host):
+    database(HOSTS=[server.base_url, dead_host])
+
+    for ticket_id in range(1, 21):
+        assert int(BenchmarkTicket.objects.get(pk=ticket_id).ticket_id) == ticket_id
+
+    assert set(request['host'] for request in requests) == set([server.base_url])
+
+
+def test_unreachable_hosts_raise_database_errors(database, dead_host):
+    database(HOST=dead_host, HOSTS=[dead_host, dead_host])
+
+    with pytest.raises(DatabaseError) as error:
+        BenchmarkTicket.objects.get(pk=1)
+
+    assert 'secret' not in str(error.value)
@@ -0,0 +1,97 @@
+"""
+
+.. module:: django-ewiz.tests.test_decompiler
+    :synopsis: django-ewiz select, count and aggregate tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from threading import Barrier, Thread
+
+from benchmarks.models import BenchmarkTicket
+
+from .conftest import server
+
+
+def concurrently(func, threads=8):
+    """Calls func from several threads at once and returns their results."""
+
+    barrier = Barrier(threads)
+    results = [None] * threads
+
+    def run(index):
+        barrier.wait()
+        results[index] = func()
+
+    workers = [Thread(target=run, args=(index,)) for index in range(threads)]
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
+    return results
+
+
+def test_identical_concurrent_requests_are_coalesced(table, monkeypatch):
+    monkeypatch.setattr(server, 'latency', 0.2)
+    expected = sum(1 for ticket in table.values() if ticket['status'] == 'Open')
+    request_count = server.request_count
+
+    assert concurrently(lambda: BenchmarkTicket.objects.filter(status='Open').count()) == [expected] * 8
+    assert server.request_count - request_count == 1
+
+    request_count = server.request_count
+
+    assert set(concurrently(lambda: BenchmarkTicket.objects.get(pk=3).subject)) == {'Ticket 3'}
+    assert server.request_count - request_count == 2
+
+
+def test_coalescing_can_be_disabled(database, monkeypatch):
+    database(COALESCE_REQUESTS=False)
+    monkeypatch.setattr(server, 'latency', 0.2)
+    request_count = server.request_count
+
+    concurrently(lambda: BenchmarkTicket.objects.filter(status='Open').count())
+
+    assert server.request_count - request_count == 8
+
+
+def test_responses_are_compressed(requests, monkeypatch):
+    list(BenchmarkTicket.objects.all()[:50])
+    select = requests[0]
+
+    assert select['operation'] == 'EWSelect'
+    assert 0 < select['wire_bytes'] < select['response_bytes']
+
+    monkeypatch.setattr(server, 'compress', False)
+    del requests[:]
+
+    list(BenchmarkTicket.objects.all()[:50])
+
+    assert requests[0]['wire_bytes'] == requests[0]['response_bytes'] == select['response_bytes']
+
+
+def test_charset_overrides_the_response_encoding(table, database):
+    table['3']['subject'] = u'Caf\xe9'
+
+    assert BenchmarkTicket.objects.get(pk=3).subject == u'Caf\xe9'
+
+    database(CHARSET='latin-1')
+
+    assert BenchmarkTicket.objects.get(pk=3).subject == u'Caf\xc3\xa9'
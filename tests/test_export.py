@@ -0,0 +1,106 @@
+"""
+
+.. module:: django-ewiz.tests.test_export
+    :synopsis: django-ewiz export tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from io import StringIO
+import csv
+import json
+
+from django.core.management import call_command
+import pytest
+
+from benchmarks.models import BenchmarkTicket
+from django_ewiz.export import export_tickets, read_last_id
+
+
+FIELDS = ['subject', 'status']
+
+
+def read(path, export_format):
+    with open(path, newline='') as export_file:
+        if export_format == 'ndjson':
+            return [json.loads(line) for line in export_file]
+
+        return list(csv.reader(export_file))
+
+
+@pytest.mark.parametrize('export_format', ['ndjson', 'csv'])
+def test_export(tmpdir, table, export_format):
+    path = str(tmpdir.join('tickets.' + export_format))
+
+    assert export_tickets(BenchmarkTicket, path, export_format, fields=FIELDS, batch_size=7)[0] == len(table)
+
+    rows = read(path, export_format)
+
+    if export_format == 'ndjson':
+        assert rows[0] == {'ticket_id': '1', 'subject': 'Ticket 1', 'status': table['1']['status']}
+        assert [int(row['ticket_id']) for row in rows] == list(range(1, len(table) + 1))
+    else:
+        assert rows[:2] == [['ticket_id'] + FIELDS, ['1', 'Ticket 1', table['1']['status']]]
+        assert len(rows) == len(table) + 1
+
+
+@pytest.mark.parametrize('export_format', ['ndjson', 'csv'])
+def test_resume(tmpdir, export_format):
+    path = str(tmpdir.join('tickets.' + export_format))
+    export_tickets(BenchmarkTicket, path, export_format, fields=FIELDS)
+
+    with open(path, 'rb') as export_file:
+        expected = export_file.read()
+
+    # Interrupted in the middle of the 21st ticket
+    lines = expected.splitlines(True)
+    start = 20 if export_format == 'ndjson' else 21
+
+    with open(path, 'wb') as export_file:
+        export_file.write(b''.join(lines[:start]) + lines[start][:9])
+
+    assert read_last_id(path, export_format, 'ticket_id') == '20'
+    assert export_tickets(BenchmarkTicket, path, export_format, fields=FIELDS, resume=True)[0] == 40
+
+    with open(path, 'rb') as export_file:
+        assert export_file.read() == expected
+
+    assert export_tickets(BenchmarkTicket, path, export_format, fields=FIELDS, resume=True)[0] == 0
+
+
+def test_resume_without_a_complete_row(tmpdir):
+    path = str(tmpdir.join('tickets.csv'))
+
+    with open(path, 'w') as export_file:
+        export_file.write('ticket_id,subject,status\r\n')
+
+    assert read_last_id(path, 'csv', 'ticket_id') is None
+
+    with open(path, 'w') as export_file:
+        export_file.write('ticket_id,subj')
+
+    assert read_last_id(path, 'csv', 'ticket_id') is None
+    assert export_tickets(BenchmarkTicket, path, 'csv', fields=FIELDS, resume=True)[0] == 60
+    assert len(read(path, 'csv')) == 61
+
+
+def test_export_command(tmpdir, table):
+    path = str(tmpdir.join('tickets.csv'))
+
+    call_command('ewiz_export', 'benchmarks.BenchmarkTicket', path, export_format='csv', fields='subject', after_id='50', stderr=StringIO())
+
+    assert read(path, 'csv') == [['ticket_id', 'subject']] + [[str(ticket_id), 'Ticket %d' % ticket_id] for ticket_id in range(51, 61)]
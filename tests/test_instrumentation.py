@@ -0,0 +1,59 @@
+"""
+
+.. module:: django-ewiz.tests.test_instrumentation
+    :synopsis: django-ewiz select, count and aggregate tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.db import connection
+from django.db.utils import DatabaseError
+import pytest
+
+from benchmarks.models import BenchmarkTicket
+
+from .conftest import server
+
+
+def test_requests_are_recorded(requests):
+    tickets = list(BenchmarkTicket.objects.filter(pk__in=[3, 4]))
+
+    assert [request['operation'] for request in requests] == ['EWSelect', 'EWRead', 'EWRead']
+    assert [request['ticket_count'] for request in requests] == [2, 1, 1]
+    assert all(request['status_code'] == 200 and request['response_bytes'] > 0 for request in requests)
+    assert all('secret' not in request['url'] for request in requests)
+    assert len(tickets) == 2
+
+
+def test_requests_are_logged_as_queries(monkeypatch):
+    monkeypatch.setattr(connection, 'force_debug_cursor', True)
+    connection.queries_log.clear()
+
+    BenchmarkTicket.objects.get(pk=3)
+
+    assert [query['sql'].split('?', 1)[0].rsplit('/', 1)[-1] for query in connection.queries] == ['EWSelect', 'EWRead']
+    assert all('secret' not in query['sql'] for query in connection.queries)
+
+
+def test_errors_do_not_include_the_password(requests):
+    server.error_rate = 1.0
+
+    with pytest.raises(DatabaseError) as error:
+        BenchmarkTicket.objects.filter(status='Open').count()
+
+    assert 'secret' not in str(error.value)
+    assert requests and all('secret' not in str(request['error']) for request in requests)
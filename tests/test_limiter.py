@@ -0,0 +1,65 @@
+"""
+
+.. module:: django-ewiz.tests.test_limiter
+    :synopsis: django-ewiz adaptive limiter tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.db import connection
+from django.db.utils import DatabaseError
+import pytest
+
+from benchmarks.models import BenchmarkTicket
+from django_ewiz.decompiler import EwizDecompiler
+from django_ewiz.limiter import AdaptiveLimiter, get_limiter
+
+from .conftest import TABLE, server
+
+
+def test_failures_decrease_the_limit():
+    limiter = AdaptiveLimiter(1, 16, 8)
+
+    limiter.acquire()
+    limiter.release(0.1, failed=True)
+
+    assert limiter.current_limit == 5
+    assert limiter.in_flight == 0
+
+
+def test_unsampled_releases_only_free_the_slot():
+    limiter = AdaptiveLimiter(1, 16, 8)
+
+    limiter.acquire()
+    limiter.release(10.0, failed=True, sample=False)
+
+    assert limiter.limit == 8
+    assert limiter.baseline is None
+    assert limiter.in_flight == 0
+
+
+def test_coalesced_client_errors_do_not_decrease_the_limit(database, requests, monkeypatch):
+    database(MAX_CONNECTIONS=8, NUM_CONNECTIONS=8)
+    monkeypatch.setattr(server, 'latency', 0.1)
+    monkeypatch.delitem(server.tables, TABLE)
+
+    # Concurrent reads of the same ticket share a single 404
+    with pytest.raises(DatabaseError):
+        EwizDecompiler(BenchmarkTicket, connection.settings_dict, connection).read(['3'] * 8)
+
+    assert any(request['coalesced'] for request in requests)
+    assert get_limiter(connection.settings_dict).limit >= 8
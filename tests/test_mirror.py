@@ -0,0 +1,160 @@
+"""
+
+.. module:: django-ewiz.tests.test_mirror
+    :synopsis: django-ewiz local mirror tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+from threading import Thread, active_count
+from time import time
+
+from django.db import connections
+import pytest
+
+from benchmarks.models import BenchmarkTicket
+from django_ewiz.mirror import STATE_TABLE, MirrorRouter, get_mirrors
+
+
+@pytest.fixture
+def mirror():
+    mirror = get_mirrors()['mirrored']
+    mirror.create_tables()
+    mirror.reconciled.clear()
+
+    yield mirror
+
+    BenchmarkTicket.objects.using('mirror').all().delete()
+
+    with connections['mirror'].cursor() as cursor:
+        cursor.execute("DELETE FROM %s" % STATE_TABLE)
+
+
+def in_thread(func):
+    """Calls func in another thread, and so on another connection to the mirror database, and returns its result."""
+
+    result = []
+
+    def run():
+        try:
+            result.append(func())
+        except Exception as error:
+            result.append(error)
+        finally:
+            connections.close_all()
+
+    thread = Thread(target=run)
+    thread.start()
+    thread.join()
+
+    return result[0]
+
+
+def set_lease(locked_until):
+    with connections['mirror'].cursor() as cursor:
+        cursor.execute("INSERT INTO %s (label, reconciled_at, locked_until) VALUES ('benchmarks.BenchmarkTicket', 0, %%s)" % STATE_TABLE, [locked_until])
+
+
+def test_reconcile(table, mirror):
+    assert mirror.reconcile(BenchmarkTicket) == (len(table), 0)
+
+    del table['7']
+    table['8']['subject'] = 'Changed'
+
+    assert mirror.reconcile(BenchmarkTicket) == (len(table), 1)
+    assert BenchmarkTicket.objects.using('mirror').count() == len(table)
+    assert BenchmarkTicket.objects.using('mirror').get(pk=8).subject == 'Changed'
+
+
+def test_router_reads_from_a_fresh_mirror_without_reconciling(mirror):
+    router = MirrorRouter()
+    threads = active_count()
+
+    assert router.db_for_read(BenchmarkTicket) == 'mirrored'
+    assert active_count() == threads
+    assert BenchmarkTicket.objects.using('mirror').count() == 0
+
+    mirror.reconcile(BenchmarkTicket)
+    mirror.reconciled.clear()
+
+    assert router.db_for_read(BenchmarkTicket) == 'mirror'
+    assert router.db_for_write(BenchmarkTicket) == 'mirrored'
+
+
+def test_batches_are_committed_on_their_own(table, mirror, monkeypatch):
+    renew = mirror.renew
+    progress = []
+
+    def write_and_count():
+        # As a save copied into the mirror by another process would
+        BenchmarkTicket.objects.using('mirror').filter(pk=1).update(status='Copied')
+
+        return BenchmarkTicket.objects.using('mirror').count()
+
+    def renew_and_check(label, lease):
+        progress.append(in_thread(write_and_count))
+
+        return renew(label, lease)
+
+    monkeypatch.setattr(mirror, 'renew', renew_and_check)
+
+    mirror.reconcile(BenchmarkTicket)
+
+    # MIRROR_BATCH_SIZE is 25
+    assert progress == [25, 50, 60]
+
+
+def test_concurrent_reconciliations_run_once(table, mirror):
+    results = []
+
+    def reconcile():
+        try:
+            results.append(mirror.reconcile(BenchmarkTicket))
+        except Exception as error:
+            results.append(error)
+        finally:
+            connections.close_all()
+
+    threads = [Thread(target=reconcile) for index in range(3)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    # The others skip the model while it is being reconciled, or find nothing left to copy
+    assert (len(table), 0) in results
+    assert all(result in (None, (len(table), 0), (0, 0)) for result in results)
+    assert sorted(int(pk) for pk in BenchmarkTicket.objects.using('mirror').values_list('pk', flat=True)) == list(range(1, len(table) + 1))
+
+
+def test_live_leases_are_skipped(mirror):
+    set_lease(time() + 60)
+
+    assert mirror.reconcile(BenchmarkTicket) is None
+    assert BenchmarkTicket.objects.using('mirror').count() == 0
+
+
+def test_expired_leases_are_taken_over(table, mirror):
+    set_lease(time() - 1)
+
+    assert mirror.reconcile(BenchmarkTicket) == (len(table), 0)
+
+    # The lease is released
+    with connections['mirror'].cursor() as cursor:
+        cursor.execute("SELECT locked_until FROM %s" % STATE_TABLE)
+        assert cursor.fetchall() == [(None,)]
@@ -0,0 +1,54 @@
+"""
+
+.. module:: django-ewiz.tests.test_prefetch
+    :synopsis: django-ewiz page prefetching tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.db import connection
+
+from benchmarks.models import BenchmarkTicket
+from django_ewiz.prefetch import get_prefetcher
+
+
+def selects(requests):
+    return [request['url'] for request in requests if request['operation'] == 'EWSelect']
+
+
+def test_one_off_slices_are_not_prefetched_from(database, requests):
+    database(PREFETCH_PAGES=1)
+
+    BenchmarkTicket.objects.filter(status='Open')[:1].get()
+    list(BenchmarkTicket.objects.filter(status='Open')[10:15])
+    list(BenchmarkTicket.objects.filter(status='Closed')[:5])
+
+    assert len(selects(requests)) == 3
+    assert not get_prefetcher(connection.settings_dict).pages
+
+
+def test_sequential_pages_are_prefetched(database, requests):
+    database(PREFETCH_PAGES=1)
+    queryset = BenchmarkTicket.objects.all()
+
+    pages = [[int(ticket.ticket_id) for ticket in queryset[low:low + 5]] for low in range(0, 20, 5)]
+
+    assert pages == [list(range(low + 1, low + 6)) for low in range(0, 20, 5)]
+
+    # The second page starts prefetching the third, and each page handed over starts prefetching the next
+    for offset in (10, 15):
+        assert len([url for url in selects(requests) if url.endswith('OFFSET%%20%d' % offset)]) == 1
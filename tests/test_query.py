@@ -0,0 +1,131 @@
+"""
+
+.. module:: django-ewiz.tests.test_query
+    :synopsis: django-ewiz select, count and aggregate tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.db.models import Count, Max, Min, Sum
+
+from benchmarks.models import BenchmarkTicket
+
+
+def ids(queryset):
+    return [int(ticket.ticket_id) for ticket in queryset]
+
+
+def test_slice(table):
+    assert ids(BenchmarkTicket.objects.all()[10:15]) == [11, 12, 13, 14, 15]
+
+
+def test_filter(table):
+    expected = sorted(int(ticket_id) for ticket_id, ticket in table.items() if ticket['status'] == 'Open')
+
+    assert ids(BenchmarkTicket.objects.filter(status='Open')) == expected
+    assert BenchmarkTicket.objects.filter(status='Open').count() == len(expected)
+
+
+def test_chunked_in_filters_match_a_single_select(database):
+    # Out of order and overlapping, so that each chunk's ids interleave with the others'
+    pks = [2, 40, 4, 6, 33, 12, 14, 2, 51, 7, 19, 60, 1, 28, 33]
+
+    def query():
+        queryset = BenchmarkTicket.objects.filter(pk__in=pks)
+        return ids(queryset), ids(queryset[:5]), ids(queryset[3:8]), queryset.count()
+
+    database(IN_CHUNK_SIZE=1000)
+    expected = query()
+
+    database(IN_CHUNK_SIZE=4)
+    assert query() == expected
+    assert expected[0] == sorted(set(pks))
+
+
+def test_aggregates(table):
+    priorities = [int(ticket['priority']) for ticket in table.values()]
+
+    result = BenchmarkTicket.objects.aggregate(count=Count('pk'), total=Sum('priority'), low=Min('priority'), high=Max('priority'))
+
+    assert result['count'] == len(table)
+    assert int(result['total']) == sum(priorities)
+    assert int(result['low']) == min(priorities)
+    assert int(result['high']) == max(priorities)
+
+
+def test_grouped_aggregates(table):
+    expected = {}
+    for ticket in table.values():
+        expected[ticket['status']] = expected.get(ticket['status'], 0) + 1
+
+    rows = BenchmarkTicket.objects.values('status').annotate(tickets=Count('pk'))
+
+    assert dict((row['status'], row['tickets']) for row in rows) == expected
+
+
+def test_values_list(table):
+    assert [int(pk) for pk in BenchmarkTicket.objects.filter(status='Open').values_list('pk', flat=True)] == \
+        sorted(int(ticket_id) for ticket_id, ticket in table.items() if ticket['status'] == 'Open')
+
+
+def test_aggregates_of_no_tickets():
+    assert BenchmarkTicket.objects.filter(status='Missing').aggregate(count=Count('pk'), high=Max('priority')) == {'count': 0, 'high': None}
+
+
+def test_regex_is_evaluated_locally(table):
+    table['7']['subject'] = 'Printer on fire'
+    table['9']['subject'] = 'printer jammed'
+
+    queryset = BenchmarkTicket.objects.filter(subject__regex=r'^Printer')
+
+    assert ids(queryset) == [7]
+    assert queryset.count() == 1
+    assert ids(BenchmarkTicket.objects.filter(subject__iregex=r'^printer')) == [7, 9]
+    assert ids(BenchmarkTicket.objects.exclude(subject__regex=r'^Ticket')) == [7, 9]
+
+
+def test_residual_filters_are_sliced_after_filtering(table):
+    for ticket_id in ('3', '20', '31', '45'):
+        table[ticket_id]['subject'] = 'Broken ' + ticket_id
+
+    queryset = BenchmarkTicket.objects.filter(subject__regex=r'^Broken')
+
+    assert ids(queryset[1:3]) == [20, 31]
+    assert int(queryset[3].ticket_id) == 45
+
+
+def test_case_sensitive_lookups(table, database):
+    table['5']['subject'] = 'VPN down'
+    table['6']['subject'] = 'vpn down'
+
+    assert ids(BenchmarkTicket.objects.filter(subject='VPN down')) == [5, 6]
+
+    database(CASE_SENSITIVE_LOOKUPS=True)
+
+    assert ids(BenchmarkTicket.objects.filter(subject='VPN down')) == [5]
+    assert ids(BenchmarkTicket.objects.filter(subject__contains='vpn')) == [6]
+    assert BenchmarkTicket.objects.filter(subject__startswith='VPN').count() == 1
+    assert ids(BenchmarkTicket.objects.filter(subject__iexact='vpn DOWN')) == [5, 6]
+
+
+def test_case_sensitive_lookups_only_check_text_locally(database):
+    database(CASE_SENSITIVE_LOOKUPS=True)
+
+    query = BenchmarkTicket.objects.filter(pk=5, subject='Ticket 5').query.get_compiler('default').build_query()
+
+    assert [column for column, predicate, negated in query.compiled_query['residual_filters']] == ['subject']
+    assert ids(BenchmarkTicket.objects.filter(pk=5)) == [5]
@@ -0,0 +1,95 @@
+"""
+
+.. module:: django-ewiz.tests.test_related
+    :synopsis: django-ewiz related field tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+try:
+    from urllib.parse import parse_qs, urlsplit
+except ImportError:
+    from urlparse import parse_qs, urlsplit
+
+import pytest
+
+from benchmarks.models import BenchmarkTicket
+from django_ewiz import Related, prefetch_related_tickets
+
+from .conftest import server
+from .models import Person, Ticket
+
+
+SUBMITTER = Related('submitter_username', Person, to_field='username')
+
+
+@pytest.fixture(autouse=True)
+def people(monkeypatch):
+    """Serves a person table holding only every other submitter of the generated table."""
+
+    people = dict((str(person_id), {'id': str(person_id), 'username': 'user%d' % person_id, 'name': 'User %d' % person_id}) for person_id in range(1, 51, 2))
+    monkeypatch.setitem(server.tables, 'person', people)
+
+    return people
+
+
+def requested(requests, operation, table):
+    return [request for request in requests if request['operation'] == operation and parse_qs(urlsplit(request['url']).query)['$table'] == [table]]
+
+
+def test_related_tickets_are_requested_in_batch(table, requests):
+    lookups = [SUBMITTER, Related('submitter_username', Person, to_field='username', to_attr='submitter'), Related('subject', BenchmarkTicket, to_field='subject')]
+    tickets = list(Ticket.objects.prefetch_tickets(*lookups)[:20])
+
+    usernames = set(ticket.submitter_username for ticket in tickets)
+    people = [username for username in usernames if int(username[4:]) % 2]
+
+    # One select per related table and field, and one read per distinct related ticket
+    assert len(requested(requests, 'EWSelect', 'person')) == 1
+    assert len(requested(requests, 'EWRead', 'person')) == len(people) < len(tickets)
+    assert len(requested(requests, 'EWSelect', 'benchmark_ticket')) == 2
+
+    for ticket in tickets:
+        if ticket.submitter_username in people:
+            assert ticket.submitter_username_object.username == ticket.submitter_username
+        else:
+            assert ticket.submitter_username_object is None
+
+        assert ticket.submitter is ticket.submitter_username_object
+        assert ticket.subject_object.pk == ticket.pk
+
+
+def test_values_are_not_resolved(requests):
+    rows = list(Ticket.objects.prefetch_tickets(SUBMITTER).values('submitter_username')[:5])
+
+    assert len(rows) == 5
+    assert not requested(requests, 'EWSelect', 'person')
+
+
+def test_prefetch_tickets_none_clears_the_lookups(requests):
+    tickets = list(Ticket.objects.prefetch_tickets(SUBMITTER).prefetch_tickets(None)[:5])
+
+    assert len(tickets) == 5
+    assert not requested(requests, 'EWSelect', 'person')
+    assert not any(hasattr(ticket, 'submitter_username_object') for ticket in tickets)
+
+
+def test_prefetch_related_tickets():
+    tickets = prefetch_related_tickets(BenchmarkTicket.objects.filter(pk__in=[1, 2, 3]), SUBMITTER)
+
+    assert [ticket.submitter_username_object and ticket.submitter_username_object.username for ticket in tickets] == \
+        [ticket.submitter_username if int(ticket.submitter_username[4:]) % 2 else None for ticket in tickets]
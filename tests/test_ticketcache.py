@@ -0,0 +1,98 @@
+"""
+
+.. module:: django-ewiz.tests.test_ticketcache
+    :synopsis: django-ewiz ticket cache tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.db import connection
+
+from benchmarks.models import BenchmarkTicket
+from django_ewiz.ticketcache import get_ticket_cache
+
+from .conftest import server
+
+
+def expire():
+    for entry in get_ticket_cache(connection.settings_dict).entries.values():
+        entry.expires = 0
+
+
+def test_fresh_tickets_are_not_read_again(database, requests):
+    database(TICKET_CACHE_TIMEOUT=60)
+
+    BenchmarkTicket.objects.get(pk=3)
+    del requests[:]
+    BenchmarkTicket.objects.get(pk=3)
+
+    reads = [request for request in requests if request['operation'] == 'EWRead']
+    assert [(read.get('cache_hit'), read['response_bytes'], read['status_code']) for read in reads] == [(True, 0, None)]
+
+
+def test_expired_tickets_are_revalidated_with_etags(table, database, requests):
+    server.etags = True
+    database(TICKET_CACHE_TIMEOUT=60)
+
+    BenchmarkTicket.objects.get(pk=3)
+    expire()
+    del requests[:]
+
+    assert BenchmarkTicket.objects.get(pk=3).subject == 'Ticket 3'
+
+    reads = [request for request in requests if request['operation'] == 'EWRead' and not request.get('cache_hit')]
+    assert [(read['status_code'], read['revalidated']) for read in reads] == [(304, True)]
+
+    # A changed ticket is read again
+    table['3']['subject'] = 'Changed'
+    expire()
+
+    assert BenchmarkTicket.objects.get(pk=3).subject == 'Changed'
+
+
+def test_expired_tickets_are_revalidated_with_modified_column(table, database, requests):
+    for ticket in table.values():
+        ticket['updated'] = '100'
+
+    database(TICKET_CACHE_TIMEOUT=60, MODIFIED_COLUMN='updated')
+
+    BenchmarkTicket.objects.get(pk=3)
+    expire()
+    del requests[:]
+
+    assert BenchmarkTicket.objects.get(pk=3).subject == 'Ticket 3'
+
+    # After get()'s select of the id, the revalidating select is recorded on its own and the ticket isn't downloaded again
+    select, read = requests[1:]
+
+    assert (select['operation'], select['ticket_count'], select['status_code']) == ('EWSelect', 1, 200)
+    assert (read['operation'], read['response_bytes'], read['status_code'], read['revalidated']) == ('EWRead', 0, None, True)
+
+    # A changed ticket is read again
+    table['3'].update(subject='Changed', updated='200')
+    expire()
+
+    assert BenchmarkTicket.objects.get(pk=3).subject == 'Changed'
+
+
+def test_updates_invalidate_cached_tickets(table, database):
+    database(TICKET_CACHE_TIMEOUT=60)
+
+    BenchmarkTicket.objects.get(pk=3)
+    BenchmarkTicket.objects.filter(pk=3).update(subject='Changed')
+
+    assert BenchmarkTicket.objects.get(pk=3).subject == 'Changed'
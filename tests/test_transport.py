@@ -0,0 +1,76 @@
+"""
+
+.. module:: django-ewiz.tests.test_transport
+    :synopsis: django-ewiz write transport tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+from django.db import connection
+
+from benchmarks.models import BenchmarkTicket
+from django_ewiz import transport
+from django_ewiz.registry import get_key
+
+from .conftest import server
+
+
+SUBJECT = 'Printer & scanner down'
+
+
+def writes(requests):
+    return [request for request in requests if request['operation'] in ('EWCreate', 'EWUpdate')]
+
+
+def test_post_writes(table, database, requests):
+    database(WRITE_TRANSPORT='post')
+
+    BenchmarkTicket.objects.filter(pk=4).update(subject=SUBJECT)
+    ticket = BenchmarkTicket.objects.create(subject=SUBJECT, status='Open', priority='1', submitter_username='user1')
+
+    assert table['4']['subject'] == table[str(ticket.pk)]['subject'] == SUBJECT
+    assert BenchmarkTicket.objects.get(pk=4).subject == SUBJECT
+
+    # The parameters are sent in the body
+    assert [request['url'].endswith(request['operation']) for request in writes(requests)] == [True, True]
+
+
+def test_refused_post_writes_fall_back_to_get(table, database, monkeypatch):
+    database(WRITE_TRANSPORT='post')
+    monkeypatch.setattr(server, 'accept_post', False)
+    request_count = server.request_count
+
+    BenchmarkTicket.objects.filter(pk=4).update(subject=SUBJECT)
+
+    assert table['4']['subject'] == SUBJECT
+    assert server.request_count - request_count == 2
+    assert get_key(connection.settings_dict) in transport.get_only
+
+    # Later writes go straight to GET
+    request_count = server.request_count
+    BenchmarkTicket.objects.filter(pk=4).update(status='Closed')
+
+    assert table['4']['status'] == 'Closed'
+    assert server.request_count - request_count == 1
+
+
+def test_get_writes(table, requests):
+    BenchmarkTicket.objects.filter(pk=4).update(subject=SUBJECT)
+
+    assert table['4']['subject'] == SUBJECT
+    assert all('subject=' in request['url'] for request in writes(requests))
+    assert not transport.get_only
@@ -0,0 +1,131 @@
+"""
+
+.. module:: django-ewiz.tests.test_writebehind
+    :synopsis: django-ewiz write-behind tests.
+
+    django-ewiz is free software: you can redistribute it and/or modify
+    it under the terms of the GNU Lesser Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    django-ewiz is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+    GNU Lesser Public License for more details.
+
+    You should have received a copy of the GNU Lesser Public License
+    along with django-ewiz. If not, see <http://www.gnu.org/licenses/>.
+
+.. moduleauthor:: Alex Kavanaugh <kavanaugh.development@outlook.com>
+
+"""
+
+import os
+import subprocess
+import sys
+
+from django.db import connection
+import pytest
+
+from benchmarks.models import BenchmarkTicket
+from django_ewiz import writebehind
+
+from .conftest import server
+
+
+# Queues an update in a separate interpreter and exits long before the next background flush
+EXIT_SCRIPT = """
+import django
+from django.conf import settings
+
+settings.configure(
+    INSTALLED_APPS=['django_ewiz', 'benchmarks'],
+    DATABASES={'default': {'ENGINE': 'django_ewiz', 'NAME': 'test', 'USER': 'test', 'PASSWORD': 'secret', 'HOST': %r, 'PORT': '80',
+                           'WRITE_BEHIND': True, 'WRITE_BEHIND_INTERVAL': 60}},
+)
+django.setup()
+
+from benchmarks.models import BenchmarkTicket
+
+BenchmarkTicket.objects.filter(pk=4).update(status='Closed')
+"""
+
+
+def updates(requests):
+    return [request for request in requests if request['operation'] == 'EWUpdate']
+
+
+def test_updates_are_merged(table, database, requests):
+    database(WRITE_BEHIND=True, WRITE_BEHIND_INTERVAL=60)
+
+    BenchmarkTicket.objects.filter(pk=4).update(status='Closed')
+    BenchmarkTicket.objects.filter(pk=4).update(priority='1')
+    BenchmarkTicket.objects.filter(pk=4).update(status='Resolved')
+    BenchmarkTicket.objects.filter(pk=8).update(status='Closed')
+
+    assert not updates(requests)
+    assert table['4']['status'] != 'Resolved'
+
+    writebehind.flush(connection.settings_dict)
+
+    assert len(updates(requests)) == 2
+    assert (table['4']['status'], table['4']['priority']) == ('Resolved', '1')
+    assert table['8']['status'] == 'Closed'
+
+
+def test_updates_are_sent_in_the_background(table, database):
+    database(WRITE_BEHIND=True, WRITE_BEHIND_INTERVAL=0.01)
+
+    BenchmarkTicket.objects.filter(pk=4).update(status='Closed')
+
+    for attempt in range(200):
+        if table['4']['status'] == 'Closed':
+            break
+
+        writebehind.get_queue(connection.settings_dict).wakeup.wait(0.01)
+
+    assert table['4']['status'] == 'Closed'
+
+
+def test_flush_raises_failed_updates():
+    queue = writebehind.WriteQueue(interval=60)
+    sent = []
+
+    def send(values):
+        sent.append(values)
+        raise ValueError("Update failed")
+
+    queue.enqueue('ticket', [(BenchmarkTicket._meta.get_field('status'), 'Closed')], send)
+
+    with pytest.raises(ValueError):
+        queue.flush()
+
+    assert len(sent) == 1
+
+    # The error is only raised once
+    queue.flush()
+
+
+def test_refused_updates_stay_queued():
+    queue = writebehind.WriteQueue(interval=60)
+    sent = []
+
+    queue.enqueue('ticket', [(BenchmarkTicket._meta.get_field('status'), 'Closed')], sent.append)
+    queue.executor.shutdown()
+
+    with pytest.raises(RuntimeError):
+        queue.submit()
+
+    assert list(queue.pending) == ['ticket']
+
+    queue.flush(synchronous=True)
+
+    assert len(sent) == 1 and not queue.pending and not queue.in_flight
+
+
+def test_queued_updates_are_sent_at_exit(table):
+    table['4']['status'] = 'Open'
+
+    subprocess.check_call([sys.executable, '-c', EXIT_SCRIPT % server.base_url], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    assert table['4']['status'] == 'Closed'